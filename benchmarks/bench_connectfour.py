@@ -0,0 +1,125 @@
+"""Micro-benchmark of the Connect Four bitboard against the old list of lists board.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_connectfour --games 2000
+
+Both boards play the same random games, checking for a win after every move like
+ConnectFourInput does, and must agree on every result.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Optional
+
+from lib.connectfour import BitBoard
+
+
+class ListBoard:
+    """The list of lists board ConnectFourBoard used before the bitboard, players are 0 and 1."""
+
+    def __init__(self) -> None:
+        self.columns = 7
+        self.rows = 6
+        self._board: list[list[Optional[int]]] = [[None for _ in range(self.columns)] for _ in range(self.rows)]
+
+    def play(self, column: int, player: int) -> Optional[int]:
+        for row in reversed(range(self.rows)):
+            if self._board[row][column] is None:
+                self._board[row][column] = player
+                return row
+        return None
+
+    def is_full(self) -> bool:
+        return all(cell is not None for cell in self._board[0])
+
+    def is_win(self, player: int) -> bool:
+        board = self._board
+        for row in range(self.rows):
+            for col in range(self.columns - 3):
+                if all(board[row][col + i] == player for i in range(4)):
+                    return True
+        for row in range(self.rows - 3):
+            for col in range(self.columns):
+                if all(board[row + i][col] == player for i in range(4)):
+                    return True
+        for row in range(self.rows - 3):
+            for col in range(self.columns - 3):
+                if all(board[row + i][col + i] == player for i in range(4)):
+                    return True
+        for row in range(3, self.rows):
+            for col in range(self.columns - 3):
+                if all(board[row - i][col + i] == player for i in range(4)):
+                    return True
+        return False
+
+
+def random_games(count: int, seed: int) -> list[list[int]]:
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        heights = [0] * 7
+        moves = []
+        while len(moves) < 42:
+            column = rng.choice([c for c in range(7) if heights[c] < 6])
+            heights[column] += 1
+            moves.append(column)
+        games.append(moves)
+    return games
+
+
+def play_games(board_type: type, games: list[list[int]]) -> tuple[float, list[Optional[int]]]:
+    results: list[Optional[int]] = []
+    start = time.perf_counter()
+    for moves in games:
+        board = board_type()
+        winner = None
+        for ply, column in enumerate(moves):
+            player = ply % 2
+            board.play(column, player)
+            if board.is_win(player):
+                winner = ply
+                break
+            if board.is_full():
+                break
+        results.append(winner)
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2000, help="how many random games to play")
+    parser.add_argument("--seed", type=int, default=909)
+    parser.add_argument("--output", default=None, help="where to write the results as JSON")
+    args = parser.parse_args()
+
+    games = random_games(args.games, args.seed)
+    list_time, list_results = play_games(ListBoard, games)
+    bit_time, bit_results = play_games(BitBoard, games)
+    assert list_results == bit_results, "The boards disagree on a game's result"
+
+    moves = sum(ply + 1 if ply is not None else len(game) for ply, game in zip(bit_results, games))
+    results = {
+        "games": args.games,
+        "moves": moves,
+        "list_seconds": list_time,
+        "bitboard_seconds": bit_time,
+        "list_us_per_move": list_time / moves * 1e6,
+        "bitboard_us_per_move": bit_time / moves * 1e6,
+        "speedup": list_time / bit_time,
+    }
+
+    print(f"list board: {results['list_us_per_move']:.2f}us per move")
+    print(f"bitboard:   {results['bitboard_us_per_move']:.2f}us per move ({results['speedup']:.1f}x faster)")
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Offline benchmarks for the image generation pipeline.
+
+Run from the repository root, no Discord connection or network access is needed::
+
+    python -m benchmarks.bench_images --output bench_images.json
+
+Synthetic avatars of several sizes, modes and formats are rendered into every template.
+Each stage (decode, convert, thumbnail, paste, encode) is timed on its own, full renders are
+timed through the RenderEngine with an increasing number of workers, and resident memory is recorded
+for each stage. Pillow allocates image buffers in C where tracemalloc can't see them, so the process's
+resident set size is measured instead.
+Results are written as JSON so runs can be compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+import PIL
+from PIL import Image
+
+from lib.encoding import encode_image
+from lib.render import TEMPLATES, RenderEngine, get_plan
+
+AVATAR_SIZES = (128, 512, 1024)
+AVATAR_MODES = ("P", "L", "RGB", "RGBA")
+AVATAR_FORMATS = ("PNG", "GIF", "JPEG", "WEBP")
+
+
+def make_avatar(size: int, mode: str, fmt: str) -> bytes | None:
+    """Creates a noisy synthetic avatar, returns None if the format can't store the mode."""
+    image = Image.merge("RGB", [Image.effect_noise((size, size), 64 + 32 * i) for i in range(3)])
+    if mode == "RGBA":
+        image.putalpha(Image.linear_gradient("L").resize((size, size)))
+    elif mode != "RGB":
+        image = image.convert(mode)
+
+    buffer = io.BytesIO()
+    try:
+        image.save(buffer, fmt)
+    except OSError:
+        return None
+    return buffer.getvalue()
+
+
+def current_rss() -> int:
+    """Gets the process's resident set size in bytes, its peak so far where the current size can't be read."""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # KiB everywhere but macOS
+
+
+def time_call(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """Times a stage and measures the resident memory while its result is still alive."""
+    timings = []
+    baseline = peak = current_rss()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, current_rss())
+        del result
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "peak_rss_bytes": peak,
+        "rss_growth_bytes": peak - baseline,
+    }
+
+
+def bench_stages(template: str, avatar: bytes, repeat: int) -> dict[str, Any]:
+    plan = get_plan(template)
+    slot = plan.template.slots[0]
+
+    def decode() -> Image.Image:
+        image = Image.open(io.BytesIO(avatar))
+        image.load()
+        return image
+
+    decoded = decode()
+    converted = decoded.convert("RGBA")
+    thumbnail = converted.copy()
+    thumbnail.thumbnail(slot.size)
+    composed = plan.base.copy()
+    composed.paste(thumbnail, slot.position, plan.masks[0])
+
+    def thumbnail_stage() -> Image.Image:
+        image = converted.copy()
+        image.thumbnail(slot.size)
+        return image
+
+    def paste_stage() -> Image.Image:
+        image = plan.base.copy()
+        image.paste(thumbnail, slot.position, plan.masks[0])
+        return image
+
+    stages = {
+        "decode": time_call(decode, repeat),
+        "convert": time_call(lambda: decoded.convert("RGBA"), repeat),
+        "thumbnail": time_call(thumbnail_stage, repeat),
+        "paste": time_call(paste_stage, repeat),
+        "encode": time_call(lambda: encode_image(composed, plan.template.encoder), repeat),
+    }
+    return {"stages": stages}
+
+
+async def bench_throughput(template: str, avatar: bytes, workers: int, jobs: int) -> dict[str, float]:
+    avatars = (avatar,) * len(TEMPLATES[template].slots)
+    engine = RenderEngine(max_workers=workers)
+    try:
+        # Warm up every worker so start up time isn't measured.
+        await asyncio.gather(*(engine.render(template, *avatars) for _ in range(workers)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(engine.render(template, *avatars) for _ in range(jobs)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await engine.close()
+
+    return {"workers": workers, "jobs": jobs, "seconds": elapsed, "renders_per_second": jobs / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench_images.json", help="where to write the results")
+    parser.add_argument("--repeat", type=int, default=20, help="how many times each stage is timed")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to test throughput with")
+    parser.add_argument("--jobs", type=int, default=64, help="renders per throughput run")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "stages": [],
+        "throughput": [],
+    }
+
+    for template in TEMPLATES:
+        for size in AVATAR_SIZES:
+            for mode in AVATAR_MODES:
+                for fmt in AVATAR_FORMATS:
+                    avatar = make_avatar(size, mode, fmt)
+                    if avatar is None:
+                        continue
+
+                    result = bench_stages(template, avatar, args.repeat)
+                    result.update(template=template, size=size, mode=mode, format=fmt, avatar_bytes=len(avatar))
+                    results["stages"].append(result)
+
+                    total = sum(stage["mean_ms"] for stage in result["stages"].values())
+                    print(f"{template:<10} {size:>5}px {mode:<4} {fmt:<5} {total:8.2f}ms")
+
+        avatar = make_avatar(512, "RGBA", "PNG")
+        assert avatar is not None
+        for workers in args.workers:
+            result = asyncio.run(bench_throughput(template, avatar, workers, args.jobs))
+            result["template"] = template
+            results["throughput"].append(result)
+            print(f"{template:<10} {workers} workers: {result['renders_per_second']:.1f} renders/s")
+
+    results["peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["peak_worker_rss_kib"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    with open(args.output, "w") as fp:
+        json.dump(results, fp, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
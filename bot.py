@@ -13,6 +13,11 @@ from cachetools import TTLCache
 from discord.ext import commands
 from tortoise import Tortoise
 
+from lib.edits import EditScheduler
+from lib.errorsink import ErrorSink
+from lib.migrations import migrate
+from lib.render import RenderEngine
+
 bot_description = "I am an Inferior Utensil <3"
 
 cwd = pathlib.Path(__file__).parent
@@ -102,6 +107,15 @@ class InferiorUtensil(commands.Bot):
 
     async def setup_hook(self) -> None:
         self.session = aiohttp.ClientSession()
+        self.render_engine = RenderEngine(max_workers=self.config.get("render_workers"))
+        self.edit_scheduler = EditScheduler(interval=self.config.get("edit_interval", 1.0))
+        self.error_sink = ErrorSink(
+            batch_size=self.config.get("error_batch_size", 50),
+            flush_interval=self.config.get("error_flush_interval", 2.0),
+            max_queue=self.config.get("error_queue_size", 1000),
+            on_written=lambda errorlog: self.dispatch("errorlog_create", errorlog),
+        )
+        await self.error_sink.start()
         for file in sorted(pathlib.Path("cogs").glob("**/[!_]*.py")):
             """
             Don't get (or load) any cogs starting with an underscore (AbstractUmbra's code momento <3)
@@ -124,6 +138,9 @@ class InferiorUtensil(commands.Bot):
 
     async def close(self) -> None:
         await self.session.close()
+        await self.render_engine.close()
+        await self.edit_scheduler.close()
+        await self.error_sink.close()
         await super().close()
 
 
@@ -135,8 +152,11 @@ async def main() -> None:
 
     if config["gen_schema"]:
         await Tortoise.generate_schemas(safe=True)
+    # Runs even when the schemas aren't generated, the error sink can't write to an outdated table.
+    await migrate()
 
     await bot.start(config.get("token"), reconnect=True)
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -22,14 +22,31 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import itertools
-from dataclasses import dataclass
+import asyncio
+import functools
+import logging
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional
 
 import discord
+from cachetools import LRUCache
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
+from tortoise.transactions import in_transaction
+
+from lib.connectfour import BitBoard, ConnectFourSolver, Difficulty
+from lib.dbmodels import ConnectFourGame, ConnectFourRecord, ConnectFourStats
+from lib.edits import EditTarget
+
+_logger = logging.getLogger(__name__)
+
+CUSTOM_ID_PREFIX = "c4"
+TURN_TIMEOUT = 60  # Seconds a player has to make their move
+LEADERBOARD_SIZE = 10
+BOARD_CACHE_SIZE = 64  # Boards of the most recently played games kept with their rendered rows
+MAX_BUTTON_COLUMNS = 10  # Wider boards pick their column from a select menu
 
 
 # BRRRRT
@@ -43,6 +60,9 @@ class NumEmotes(Enum):
     five = "\U00000035\U0000fe0f\U000020e3"
     six = "\U00000036\U0000fe0f\U000020e3"
     seven = "\U00000037\U0000fe0f\U000020e3"
+    eight = "\U00000038\U0000fe0f\U000020e3"
+    nine = "\U00000039\U0000fe0f\U000020e3"
+    ten = "\U0001f51f"
 
 
 class DiscType(Enum):
@@ -53,200 +73,526 @@ class DiscType(Enum):
     yellow = "\U0001f7e1"
 
 
-@dataclass(slots=True, kw_only=True)
-class Player:
-    member: discord.Member
-    emoji: DiscType
+# Which bitboard player each disc colour is.
+PLAYER_INDEX = {DiscType.red: 0, DiscType.yellow: 1}
+PLAYER_DISCS = {index: disc for disc, index in PLAYER_INDEX.items()}
+CELL_EMOJI = {0: PLAYER_DISCS[0].value, 1: PLAYER_DISCS[1].value, None: DiscType.black.value}
 
 
-@dataclass(slots=True)
-class DiscPiece:
-    owner: Player
+@functools.lru_cache(maxsize=None)
+def column_labels(columns: int) -> tuple[str, ...]:
+    """Gets the emoji that label each column, number plaques or regional indicator letters past ten."""
+    if columns <= len(NumEmotes):
+        return tuple(num.value for num in list(NumEmotes)[:columns])
+    return tuple(chr(0x1F1E6 + column) for column in range(columns))
+
+
+@functools.lru_cache(maxsize=None)
+def board_footer(columns: int) -> str:
+    if columns <= len(NumEmotes):
+        return "".join(column_labels(columns))  # BLACK MAGIC
+    # Zero width spaces stop neighbouring regional indicators from turning into flags.
+    return "\u200b".join(column_labels(columns))
 
 
 class ConnectFourBoard:
-    def __init__(self) -> None:
-        self.columns: int = 7
-        self.rows: int = 6
-        self._board: list[list[Optional[DiscPiece]]] = [[None for _ in range(self.columns)] for _ in range(self.rows)]
+    def __init__(self, moves: bytes = b"", *, columns: int = 7, rows: int = 6, connect: int = 4) -> None:
+        self.columns: int = columns
+        self.rows: int = rows
+        self.connect: int = connect
+        self._board = BitBoard(columns, rows, connect)
+        for ply, column in enumerate(moves):
+            self._board.play(column, ply % 2)
+        # Rendered rows from the bottom, a move only invalidates the row it landed in.
+        self._rows: list[Optional[str]] = [None] * self.rows
+
+    def add_piece(self, column: int, disc: DiscType) -> Optional[int]:
+        row = self._board.play(column, PLAYER_INDEX[disc])
+        if row is None:
+            return None
+        self._rows[row] = None
+        return self.rows - 1 - row  # Rows are numbered from the top here
 
-    def add_piece(self, column: int, piece: DiscPiece) -> Optional[int]:
-        for row in reversed(range(self.rows)):
-            if not self._board[row][column]:
-                self._board[row][column] = piece
-                return row
-        return None
+    @property
+    def bitboard(self) -> BitBoard:
+        return self._board
 
     @property
-    def render(self) -> str:
-        out = str()
+    def moves(self) -> int:
+        return self._board.moves
 
-        for column in range(self.rows):
-            for row in range(self.columns):
-                item = self._board[column][row]
-                if item is not None:
-                    out += f"{item.owner.emoji.value}"
-                else:
-                    out += f"{DiscType.black.value}"
-            out += "\n"
-        out += "".join((num.value for num in NumEmotes))  # BLACK MAGIC
+    def _render_row(self, row: int) -> str:
+        rendered = self._rows[row]
+        if rendered is None:
+            cell = self._board.cell
+            rendered = self._rows[row] = "".join([CELL_EMOJI[cell(column, row)] for column in range(self.columns)])
+        return rendered
+
+    @property
+    def render(self) -> str:
+        return "\n".join([*(self._render_row(row) for row in reversed(range(self.rows))), board_footer(self.columns)])
 
-        return out
+    def can_play(self, column: int) -> bool:
+        return self._board.can_play(column)
 
     def is_full(self) -> bool:
-        return all(self._board[0])
+        return self._board.is_full()
 
     def is_win(self, piece: DiscType) -> bool:
-        # Horizontal Win
-        for row in range(self.rows):
-            for col in range(self.columns - 3):
-                if all(self._board[row][col + i] is not None and self._board[row][col + i].owner.emoji == piece for i in range(4)):  # type: ignore
-                    return True
-
-        # Vertical Win
-        for row in range(self.rows - 3):
-            for col in range(self.columns):
-                if all(self._board[row + i][col] is not None and self._board[row + i][col].owner.emoji == piece for i in range(4)):  # type: ignore
-                    return True
-
-        # Diagonal Win
-        for row in range(self.rows - 3):
-            for col in range(self.columns - 3):
-                if all(self._board[row + i][col + i] is not None and self._board[row + i][col + i].owner.emoji == piece for i in range(4)):  # type: ignore
-                    return True
-        for row in range(3, self.rows):
-            for col in range(self.columns - 3):
-                if all(self._board[row - i][col + i] is not None and self._board[row - i][col + i].owner.emoji == piece for i in range(4)):  # type: ignore
-                    return True
-
-        # If no win
-        return False
+        return self._board.is_win(PLAYER_INDEX[piece])
 
 
-class ConnectFourInput(discord.ui.View):
-    message: discord.Message
+@dataclass(slots=True)
+class GameState:
+    """The state of an unfinished game, kept as small as possible.
+
+    Players are stored by id and the board as the columns played, everything else is rebuilt when needed.
+    """
+
+    id: int
+    channel_id: int
+    players: tuple[int, int]
+    moves: bytearray = field(default_factory=bytearray)
+    difficulty: Optional[Difficulty] = None  # Set when player two is the bot
+    message_id: Optional[int] = None
+    updated_at: float = field(default_factory=time.time)
+    columns: int = 7
+    rows: int = 6
+    connect: int = 4
 
-    def __init__(self, player_one: discord.Member, player_two: discord.Member) -> None:
-        super().__init__(timeout=60)
-        self._player_one = Player(member=player_one, emoji=DiscType.red)
-        self._player_two = Player(member=player_two, emoji=DiscType.yellow)
-        self.player_iterator = itertools.cycle((self._player_one, self._player_two))
-        self.current_player = next(self.player_iterator)  # update after each move
-        self._board = ConnectFourBoard()
+    @property
+    def current_player(self) -> int:
+        return self.players[len(self.moves) % 2]
 
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        assert isinstance(interaction.user, discord.Member)
+    @property
+    def current_disc(self) -> DiscType:
+        return PLAYER_DISCS[len(self.moves) % 2]
 
-        if interaction.user == self.current_player.member:
-            return True
-        elif interaction.user != self.current_player.member and interaction.user in (
-            self._player_one.member,
-            self._player_two.member,
-        ):
-            await interaction.response.send_message(
-                f"You cannot use this currently, it's {self.current_player.member.mention}'s turn.",
-                ephemeral=True,
-            )
-        else:
-            await interaction.response.send_message(f"You are not a part of this game.", ephemeral=True)
+    @property
+    def bot_to_move(self) -> bool:
+        return self.difficulty is not None and len(self.moves) % 2 == 1
 
-        return False
+    def board(self) -> ConnectFourBoard:
+        return ConnectFourBoard(self.moves, columns=self.columns, rows=self.rows, connect=self.connect)
 
-    async def on_timeout(self) -> None:
-        for child in self.children:
-            child.disabled = True  # type: ignore
-        await self.message.edit(
-            content=f"Connect4: {self.current_player.member.mention} did not move in time so the game ended.",
-            embed=None,
-            view=None,
-        )
-        return await super().on_timeout()
 
-    def get_base_embed(self) -> discord.Embed:
-        base_embed = discord.Embed(
-            title="Connect Four", description=f"{self._player_one.member.mention} vs {self._player_two.member.mention}\n"
+class GameStore:
+    """Keeps unfinished games in memory, writing every change through to the database so they survive a restart."""
+
+    def __init__(self) -> None:
+        self._games: dict[int, GameState] = {}
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def get(self, game_id: int) -> Optional[GameState]:
+        return self._games.get(game_id)
+
+    async def load(self) -> None:
+        """Loads every unfinished game from the database."""
+        now = time.time()
+        async for row in ConnectFourGame.all():
+            self._games[row.id] = GameState(
+                id=row.id,
+                channel_id=row.channel_id,
+                players=(row.player_one, row.player_two),
+                moves=bytearray(row.moves),
+                difficulty=Difficulty[row.difficulty] if row.difficulty else None,
+                message_id=row.message_id,
+                updated_at=now,  # Players get a fresh turn timer after a restart
+                columns=row.columns,
+                rows=row.rows,
+                connect=row.connect,
+            )
+        _logger.info(f"Resumed {len(self._games)} Connect Four games.")
+
+    async def create(
+        self,
+        channel_id: int,
+        players: tuple[int, int],
+        difficulty: Optional[Difficulty],
+        *,
+        columns: int = 7,
+        rows: int = 6,
+        connect: int = 4,
+    ) -> GameState:
+        row = await ConnectFourGame.create(
+            channel_id=channel_id,
+            player_one=players[0],
+            player_two=players[1],
+            moves=b"",
+            difficulty=difficulty.name if difficulty else None,
+            columns=columns,
+            rows=rows,
+            connect=connect,
         )
-        base_embed.description += self._board.render  # type: ignore
-        return base_embed
-
-    async def update(self, interaction: discord.Interaction, /) -> None:
-        base_embed = self.get_base_embed()
-        assert base_embed.description is not None
-        win = self._board.is_win(self.current_player.emoji)
-
-        if win:
-            base_embed.description += f""  # yes, I am this lazy
-            await interaction.response.edit_message(
-                content=f"{self.current_player.member.mention} has won.", embed=base_embed
+        game = GameState(
+            id=row.id,
+            channel_id=channel_id,
+            players=players,
+            difficulty=difficulty,
+            columns=columns,
+            rows=rows,
+            connect=connect,
+        )
+        self._games[game.id] = game
+        return game
+
+    async def save(self, game: GameState) -> None:
+        await ConnectFourGame.filter(id=game.id).update(moves=bytes(game.moves), message_id=game.message_id)
+
+    async def finish(self, game: GameState, winner: Optional[int], *, forfeit: bool = False) -> None:
+        """Ends a game, recording it and updating both players' stats.
+
+        Everything happens in one transaction, so the stats always match the recorded games.
+        Games against the bot are recorded but don't count towards stats. A game that couldn't be
+        recorded is put back, so ending it can be tried again.
+
+        Parameters
+        ----------
+        game : GameState
+            The game that ended.
+        winner : Optional[int]
+            The id of the winner, None for a tie.
+        forfeit : bool
+            Whether the loser ran out of time.
+        """
+        self._games.pop(game.id, None)
+        try:
+            await self._record(game, winner, forfeit)
+        except Exception:
+            self._games.setdefault(game.id, game)
+            raise
+
+    async def _record(self, game: GameState, winner: Optional[int], forfeit: bool) -> None:
+        async with in_transaction() as connection:
+            await ConnectFourGame.filter(id=game.id).using_db(connection).delete()
+            await ConnectFourRecord.create(
+                player_one=game.players[0],
+                player_two=game.players[1],
+                winner=winner,
+                forfeit=forfeit,
+                moves=bytes(game.moves),
+                columns=game.columns,
+                rows=game.rows,
+                connect=game.connect,
+                difficulty=game.difficulty.name if game.difficulty else None,
+                using_db=connection,
             )
-            await self.message.edit(view=None)  # that works
-            self.stop()
-        elif self._board.is_full():
-            base_embed.description += "\n\nEnded in a tie."
-            await interaction.response.edit_message(embed=base_embed)
-            await self.message.edit(view=None)
-            self.stop()
-        else:
-            next_player = next(self.player_iterator)
-            self.current_player = next_player
-            base_embed.description += f"\n\n{next_player.member.mention}'s move."
-            await interaction.response.edit_message(embed=base_embed)
-
-    @property
-    def initial_embed(self) -> discord.Embed:
-        embed = self.get_base_embed()
-        embed.description += f"\n\n{self.current_player.member.mention}'s move."  # type: ignore
-        return embed
-
-    async def handle_move(self, interaction: discord.Interaction, *, players_move: int):
-        self._board.add_piece(players_move, DiscPiece(self.current_player))
-        await self.update(interaction)
-
-    @discord.ui.button(emoji=NumEmotes.one.value)
-    async def button_numero_uno(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=0)
+            if game.difficulty is not None:
+                return
 
-    @discord.ui.button(emoji=NumEmotes.two.value)
-    async def button_numero_dos(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=1)
+            players = [
+                (await ConnectFourStats.get_or_create(user_id=user_id, using_db=connection))[0] for user_id in game.players
+            ]
+            ratings = [stats.rating for stats in players]
+            for stats, opponent_rating in zip(players, reversed(ratings)):
+                score = 0.5 if winner is None else float(stats.user_id == winner)
+                stats.add_result(score, opponent_rating)
+                await stats.save(using_db=connection)
 
-    @discord.ui.button(emoji=NumEmotes.three.value)
-    async def button_numero_tres(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=2)
+    def bot_turns(self) -> list[GameState]:
+        """Gets the games waiting for the bot to move."""
+        return [game for game in self._games.values() if game.bot_to_move]
 
-    @discord.ui.button(emoji=NumEmotes.four.value)
-    async def button_numero_cuatro(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=3)
+    def expired(self, timeout: float) -> list[GameState]:
+        """Gets the games whose current player has run out of time."""
+        deadline = time.time() - timeout
+        return [game for game in self._games.values() if game.updated_at < deadline]
 
-    @discord.ui.button(emoji=NumEmotes.five.value)
-    async def button_numero_cinco(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=4)
 
-    @discord.ui.button(emoji=NumEmotes.six.value)
-    async def button_numero_seis(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=5)
-
-    @discord.ui.button(emoji=NumEmotes.seven.value)
-    async def button_numero_siete(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.handle_move(interaction, players_move=6)
+class ConnectFourInput(discord.ui.View):
+    """The column picker of a game, a button per column or a select menu for wide boards.
+
+    Presses are handled by :meth:`ConnectFour.on_interaction` using the game id and column in each
+    button's custom id, so nothing has to be kept around per game and the buttons keep working after a restart.
+    """
+
+    def __init__(self, game_id: int, columns: int = 7) -> None:
+        super().__init__(timeout=None)
+        labels = column_labels(columns)
+        if columns <= MAX_BUTTON_COLUMNS:
+            for column, label in enumerate(labels):
+                self.add_item(discord.ui.Button(emoji=label, custom_id=f"{CUSTOM_ID_PREFIX}:{game_id}:{column}"))
+        else:
+            options = [
+                discord.SelectOption(label=f"Column {column + 1}", value=str(column), emoji=label)
+                for column, label in enumerate(labels)
+            ]
+            self.add_item(
+                discord.ui.Select(custom_id=f"{CUSTOM_ID_PREFIX}:{game_id}", placeholder="Pick a column", options=options)
+            )
+        # A finished view isn't stored by discord.py, the buttons are only used for their layout.
+        self.stop()
 
 
 class ConnectFour(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.games = GameStore()
+        self._boards: LRUCache[int, ConnectFourBoard] = LRUCache(BOARD_CACHE_SIZE)
+        self._bot_thinking: set[int] = set()  # Ids of the games the bot is searching a move for
+        self.solver = ConnectFourSolver(
+            max_workers=bot.config.get("connect4_solver_workers", 1),
+            book_path=bot.config.get("connect4_opening_book"),
+        )
+
+    async def cog_load(self) -> None:
+        await self.solver.load()
+        await self.games.load()
+        self.expire_games.start()
+        self._resume_task = asyncio.create_task(self.resume_bot_turns())
+
+    async def cog_unload(self) -> None:
+        self.expire_games.cancel()
+        self._resume_task.cancel()
+        await self.solver.close()
+
+    def get_board(self, game: GameState) -> ConnectFourBoard:
+        """Gets a game's board, reusing the cached one while it's still up to date."""
+        board = self._boards.get(game.id)
+        if board is None or board.moves != len(game.moves):
+            board = self._boards[game.id] = game.board()
+        return board
+
+    def get_embed(self, game: GameState, board: ConnectFourBoard, status: str) -> discord.Embed:
+        player_one, player_two = game.players
+        description = "".join((f"<@{player_one}> vs <@{player_two}>\n", board.render, status))
+        return discord.Embed(title="Connect Four", description=description)
+
+    async def play_move(
+        self,
+        game: GameState,
+        board: ConnectFourBoard,
+        column: int,
+        message: EditTarget,
+        *,
+        interaction: Optional[discord.Interaction] = None,
+    ) -> bool:
+        """Plays a move, stores the result and schedules the edit that shows it.
+
+        Parameters
+        ----------
+        game : GameState
+            The game to play in.
+        board : ConnectFourBoard
+            The game's board.
+        column : int
+            The column to play.
+        message : Union[discord.Message, discord.PartialMessage]
+            The game's message.
+        interaction : Optional[discord.Interaction]
+            The deferred interaction on the game's message that caused the move, if any.
+
+        Returns
+        -------
+        bool
+            Whether the move ended the game.
+        """
+        disc = game.current_disc
+        player = game.current_player
+        board.add_piece(column, disc)
+        # The in memory state changes before anything is awaited, so a second press can't see the old turn.
+        game.moves.append(column)
+        game.updated_at = time.time()
+        edit = functools.partial(self.bot.edit_scheduler.schedule, message, interaction=interaction)
+
+        if board.is_win(disc):
+            self._boards.pop(game.id, None)
+            await self.games.finish(game, player)
+            edit(content=f"<@{player}> has won.", embed=self.get_embed(game, board, ""), view=None)
+            return True
+        elif board.is_full():
+            self._boards.pop(game.id, None)
+            await self.games.finish(game, None)
+            edit(embed=self.get_embed(game, board, "\n\nEnded in a tie."), view=None)
+            return True
+
+        await self.games.save(game)
+        edit(embed=self.get_embed(game, board, f"\n\n<@{game.current_player}>'s move."))
+        return False
+
+    async def play_bot_move(
+        self, game: GameState, message: EditTarget, *, interaction: Optional[discord.Interaction] = None
+    ) -> None:
+        """Searches for and plays the bot's move, unless it's already searching for one in this game.
+
+        Parameters
+        ----------
+        game : GameState
+            The game, it must be the bot's turn.
+        message : Union[discord.Message, discord.PartialMessage]
+            The game's message.
+        interaction : Optional[discord.Interaction]
+            The deferred interaction on the game's message that led to the bot's turn, if any.
+        """
+        if game.id in self._bot_thinking:
+            return
+
+        assert game.difficulty is not None
+        self._bot_thinking.add(game.id)
+        try:
+            board = self.get_board(game)
+            column = await self.solver.best_move(board.bitboard, PLAYER_INDEX[game.current_disc], game.difficulty)
+        finally:
+            self._bot_thinking.discard(game.id)
+
+        # The game may have timed out while the bot was thinking.
+        if self.games.get(game.id) is game and game.bot_to_move:
+            await self.play_move(game, self.get_board(game), column, message, interaction=interaction)
+
+    async def resume_bot_turns(self) -> None:
+        """Plays the bot's move in games where it was interrupted by a restart."""
+        for game in self.games.bot_turns():
+            if game.message_id is None:
+                continue
+            message = self.bot.get_partial_messageable(game.channel_id).get_partial_message(game.message_id)
+            try:
+                await self.play_bot_move(game, message)
+            except Exception:
+                _logger.exception(f"Could not resume the bot's turn in Connect Four game {game.id}.")
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        if interaction.type is not discord.InteractionType.component or interaction.data is None:
+            return
+
+        prefix, _, rest = interaction.data.get("custom_id", "").partition(":")
+        if prefix != CUSTOM_ID_PREFIX:
+            return
+
+        # Acknowledge right away, the board itself is updated by the edit scheduler.
+        await interaction.response.defer()
+        assert interaction.message is not None
+
+        game_id, _, column_id = rest.partition(":")
+        # Select menus carry the column in their value instead of their custom id.
+        column = int(column_id or interaction.data.get("values", ["-1"])[0])
+        game = self.games.get(int(game_id))
+        if game is None:
+            return await interaction.followup.send("This game has already ended.", ephemeral=True)
+
+        if game.bot_to_move and interaction.user.id in game.players and game.id not in self._bot_thinking:
+            # The bot's turn was interrupted, by a restart or a failed search, so it's picked back up.
+            return await self.play_bot_move(game, interaction.message, interaction=interaction)
+
+        if interaction.user.id != game.current_player:
+            if interaction.user.id in game.players:
+                await interaction.followup.send(
+                    f"You cannot use this currently, it's <@{game.current_player}>'s turn.", ephemeral=True
+                )
+            else:
+                await interaction.followup.send(f"You are not a part of this game.", ephemeral=True)
+            return
+
+        board = self.get_board(game)
+        if not 0 <= column < board.columns or not board.can_play(column):
+            return await interaction.followup.send("That column is full, pick another one.", ephemeral=True)
+
+        if await self.play_move(game, board, column, interaction.message, interaction=interaction):
+            return
+
+        if game.bot_to_move:
+            await self.play_bot_move(game, interaction.message, interaction=interaction)
+
+    @tasks.loop(seconds=10)
+    async def expire_games(self) -> None:
+        for game in self.games.expired(TURN_TIMEOUT):
+            # Finishing earlier games awaits, so a game may have been played or ended in the meantime.
+            # Nothing is awaited between this check and finish taking the game out of the store.
+            if self.games.get(game.id) is not game or game.updated_at >= time.time() - TURN_TIMEOUT:
+                continue
+
+            idle_player = game.current_player
+            winner = game.players[1] if idle_player == game.players[0] else game.players[0]
+            # An exception would end the loop and stop the turn timer of every game.
+            try:
+                await self.games.finish(game, winner, forfeit=True)
+            except Exception:
+                _logger.exception(f"Could not end Connect Four game {game.id} after a timeout.")
+                continue
+
+            self._boards.pop(game.id, None)
+            if game.message_id is None:
+                continue
+
+            message = self.bot.get_partial_messageable(game.channel_id).get_partial_message(game.message_id)
+            self.bot.edit_scheduler.schedule(
+                message,
+                content=f"Connect4: <@{idle_player}> did not move in time so the game ended.",
+                embed=None,
+                view=None,
+            )
 
-    @app_commands.command()
-    @app_commands.guild_only()
-    @app_commands.describe(target="The user to play connect4 with")
-    async def connect4(self, interaction: discord.Interaction, target: discord.Member):
+    connect4 = app_commands.Group(name="connect4", description="Play connect4!", guild_only=True)
+
+    @connect4.command(name="play")
+    @app_commands.describe(
+        target="The user to play connect4 with, pick me to play against the bot",
+        difficulty="How well the bot plays, if you're playing against it",
+        columns="How wide the board is",
+        rows="How tall the board is",
+        connect="How many pieces in a row win",
+    )
+    async def connect4_play(
+        self,
+        interaction: discord.Interaction,
+        target: discord.Member,
+        difficulty: Difficulty = Difficulty.medium,
+        columns: app_commands.Range[int, 4, 15] = 7,
+        rows: app_commands.Range[int, 4, 10] = 6,
+        connect: app_commands.Range[int, 3, 6] = 4,
+    ):
         """Play connect4 with another user!"""
         assert isinstance(interaction.user, discord.Member)
-        if target == interaction.user or target.bot:
+        assert interaction.guild is not None and interaction.channel_id is not None
+        against_bot = target == interaction.guild.me
+        if target == interaction.user or (target.bot and not against_bot):
             return await interaction.response.send_message("You cannot play against yourself or bots!", ephemeral=True)
-        view = ConnectFourInput(player_one=interaction.user, player_two=target)
-        embed = view.initial_embed
-        await interaction.response.send_message(embed=embed, view=view)
-        view.message = await interaction.original_response()
+        if connect > max(columns, rows):
+            return await interaction.response.send_message(
+                f"Nobody can get {connect} in a row on a {columns}x{rows} board!", ephemeral=True
+            )
+
+        game = await self.games.create(
+            interaction.channel_id,
+            (interaction.user.id, target.id),
+            difficulty if against_bot else None,
+            columns=columns,
+            rows=rows,
+            connect=connect,
+        )
+        embed = self.get_embed(game, self.get_board(game), f"\n\n<@{game.current_player}>'s move.")
+        await interaction.response.send_message(embed=embed, view=ConnectFourInput(game.id, game.columns))
+
+        message = await interaction.original_response()
+        game.message_id = message.id
+        await self.games.save(game)
+
+
+    @connect4.command(name="stats")
+    @app_commands.describe(user="The user to show the stats of, defaults to you")
+    async def connect4_stats(self, interaction: discord.Interaction, user: Optional[discord.User] = None):
+        """Shows someone's connect4 results and rating."""
+        user = user or interaction.user
+        stats = await ConnectFourStats.get_or_none(user_id=user.id)
+        if stats is None:
+            return await interaction.response.send_message(f"{user.mention} hasn't finished a game yet.", ephemeral=True)
+        await interaction.response.send_message(embed=stats.embed)
+
+    @connect4.command(name="leaderboard")
+    async def connect4_leaderboard(self, interaction: discord.Interaction):
+        """Shows the highest rated connect4 players."""
+        top = await ConnectFourStats.all().order_by("-rating", "user_id").limit(LEADERBOARD_SIZE)
+        if not top:
+            return await interaction.response.send_message("Nobody has finished a game yet.", ephemeral=True)
+
+        lines = [
+            f"{place}. <@{stats.user_id}> - {stats.rating} ({stats.wins}W / {stats.losses}L / {stats.draws}D)"
+            for place, stats in enumerate(top, start=1)
+        ]
+        embed = discord.Embed(title="Connect Four Leaderboard", description="\n".join(lines))
+        await interaction.response.send_message(embed=embed)
 
 
 async def setup(bot):
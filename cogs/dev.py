@@ -1,17 +1,175 @@
+import asyncio
+import datetime
 import logging
 import typing
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from lib.dbmodels import ErrorLog
+from cogs.py import PaginatorView
+from lib.dbmodels import ErrorGroup, ErrorLog
+from lib.errorsearch import search_errors
+from lib.migrations import compress_tracebacks
+from lib.retention import PruneReport, prune_errors
 from lib import utils
 
 _logger = logging.getLogger(__name__)
 
+
+def parse_date(argument: str) -> datetime.datetime:
+    """Parses an ISO 8601 date or date and time, times without a timezone are taken as UTC."""
+    try:
+        date = datetime.datetime.fromisoformat(argument)
+    except ValueError:
+        raise commands.BadArgument(f"Expected a date like 2022-12-31 or 2022-12-31T23:59, not {argument!r}.")
+    return date if date.tzinfo is not None else date.replace(tzinfo=datetime.timezone.utc)
+
+
+class ErrorFilters(commands.FlagConverter):
+    item: typing.Optional[str] = None
+    since: typing.Optional[parse_date] = None  # type: ignore
+    until: typing.Optional[parse_date] = None  # type: ignore
+
+    def to_query(self) -> dict[str, typing.Any]:
+        """Gets the filters as keyword arguments for ``ErrorLog.filter``."""
+        query: dict[str, typing.Any] = {}
+        if self.item is not None:
+            query["item"] = self.item
+        if self.since is not None:
+            query["timestamp__gte"] = self.since
+        if self.until is not None:
+            query["timestamp__lt"] = self.until
+        return query
+
+
+class ErrorBrowserView(PaginatorView):
+    """Pages through logged errors, newest first.
+
+    Pages are fetched as they're needed, continuing from the ids at the edges of the visible page
+    rather than skipping rows with an offset, so every page is as quick to get as the first and
+    only the visible page is held.
+    """
+
+    def __init__(self, owner: discord.Member | discord.User, filters: dict[str, typing.Any], *, page_size: int = 10) -> None:
+        super().__init__(owner)
+        self.filters = filters
+        self.page_size = page_size
+        self.rows: list[dict[str, typing.Any]] = []
+        self.has_newer = False
+        self.has_older = False
+
+    async def load(self, *, older: bool = True, bound: typing.Optional[int] = None) -> None:
+        """Loads the page of errors older or newer than the ``bound`` id.
+
+        Parameters
+        ----------
+        older : bool
+            Whether to load older errors rather than newer ones, defaults to True.
+        bound : Optional[int]
+            The id to continue from, the newest or oldest page is loaded without one.
+        """
+        query = ErrorLog.filter(**self.filters)
+        if bound is not None:
+            query = query.filter(id__lt=bound) if older else query.filter(id__gt=bound)
+
+        # One extra row tells whether there's another page after this one.
+        rows = await query.order_by("-id" if older else "id").limit(self.page_size + 1).values(
+            "id", "timestamp", "item", "summary"
+        )
+        more = len(rows) > self.page_size
+        self.rows = rows[: self.page_size]
+        if older:
+            self.has_older, self.has_newer = more, bound is not None
+        else:
+            self.rows.reverse()
+            self.has_newer, self.has_older = more, bound is not None
+
+    @property
+    def embed(self) -> discord.Embed:
+        embed = discord.Embed(title="Logged Errors", color=utils.randpastel_color(), description="")
+        for row in self.rows:
+            timestamp = row["timestamp"]
+            embed.description += (
+                f"{row['id']:0>5}: {row['summary'] or 'No summary'} ({row['item'] or 'unknown'}) "
+                f"on {timestamp:%m-%d-%Y} at {timestamp:%I:%M %p} UTC\n\n"
+            )
+        if not self.rows:
+            embed.description = "No errors on this page."
+        if self.filters:
+            embed.set_footer(text=", ".join(f"{key}={value}" for key, value in self.filters.items()))
+        return embed
+
+    def _update_state(self) -> None:
+        _logger.debug(f"{self!r} _update called.")
+        for button, enabled in (
+            (self.to_first_btn, self.has_newer),
+            (self.back_btn, self.has_newer),
+            (self.fwd_btn, self.has_older),
+            (self.to_last_btn, self.has_older),
+        ):
+            button.disabled = not enabled
+        self.back_btn.style = discord.ButtonStyle.green if self.has_newer else discord.ButtonStyle.grey
+        self.fwd_btn.style = discord.ButtonStyle.green if self.has_older else discord.ButtonStyle.grey
+
+        self.count_btn.label = f"{self.rows[0]['id']}-{self.rows[-1]['id']}" if self.rows else "0"
+
+    async def update(self, interaction: discord.Interaction) -> None:
+        _logger.debug(f"{self!r} update called.")
+        self._update_state()
+        message = interaction.message or self.message
+        assert message is not None
+        await interaction.client.edit_scheduler.respond(interaction, message, embed=self.embed, view=self)  # type: ignore
+
+    async def move(self, interaction: discord.Interaction, *, older: bool, bound: typing.Optional[int]) -> None:
+        # Acknowledged first, the page is fetched before the edit.
+        await interaction.response.defer()
+        await self.load(older=older, bound=bound)
+        await self.update(interaction)
+
+    async def show_first(self, interaction: discord.Interaction) -> None:
+        await self.move(interaction, older=True, bound=None)
+
+    async def show_previous(self, interaction: discord.Interaction) -> None:
+        await self.move(interaction, older=False, bound=self.rows[0]["id"] if self.rows else None)
+
+    async def show_next(self, interaction: discord.Interaction) -> None:
+        await self.move(interaction, older=True, bound=self.rows[-1]["id"] if self.rows else None)
+
+    async def show_last(self, interaction: discord.Interaction) -> None:
+        await self.move(interaction, older=False, bound=None)
+
+
 class DevTools(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self._prune_lock = asyncio.Lock()
+
+    async def cog_load(self) -> None:
+        self.enforce_retention.start()
+
+    async def cog_unload(self) -> None:
+        self.enforce_retention.cancel()
+
+    async def prune(self, **policy: typing.Any) -> PruneReport:
+        # The background task and clearerrors never prune at the same time.
+        async with self._prune_lock:
+            return await prune_errors(**policy)
+
+    @tasks.loop(hours=1)
+    async def enforce_retention(self) -> None:
+        max_age_days = self.bot.config.get("error_max_age_days")
+        max_rows = self.bot.config.get("error_max_rows")
+        if max_age_days is None and max_rows is None:
+            return
+
+        # An exception would end the loop, so a locked database only skips this run.
+        try:
+            await self.prune(
+                max_age=datetime.timedelta(days=max_age_days) if max_age_days is not None else None,
+                max_rows=max_rows,
+            )
+        except Exception:
+            _logger.exception("Could not enforce the error log retention policy.")
 
     @commands.command()
     @commands.guild_only()
@@ -58,6 +216,12 @@ class DevTools(commands.Cog):
                 ret += 1
         await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
 
+    @commands.command()
+    @commands.is_owner()
+    async def editstats(self, ctx: commands.Context) -> None:
+        """Shows how many view edits were sent and how many were saved by merging them."""
+        await ctx.send(f"```\n{self.bot.edit_scheduler}\n```")
+
     @commands.command(aliases=('e', ))
     @commands.is_owner()
     async def error(self, ctx: commands.Context, error_id: int, raw: bool = False) -> None:
@@ -70,7 +234,8 @@ class DevTools(commands.Cog):
         raw : bool
             Whether to send the error in raw form, defaults to False
         """
-        err = await ErrorLog.get_or_none(id=error_id)
+        # Recent errors may still be waiting to be written.
+        err = self.bot.error_sink.pending(error_id) or await ErrorLog.get_or_none(id=error_id).prefetch_related("group")
         if not err:
             await ctx.send(f"I could not find an error with that id. (ID: {error_id})")
             return
@@ -82,28 +247,85 @@ class DevTools(commands.Cog):
     @commands.command(aliases=('re',))
     @commands.is_owner()
     async def recenterrors(self, ctx: commands.Context) -> None:
-        """Returns the 20 most recently logged errors."""
-        errs = await ErrorLog.filter().order_by("-id").limit(20)
+        """Returns the 20 most recently seen errors, grouping repeats of the same error."""
+        groups = await ErrorGroup.filter().order_by("-last_seen").limit(20)
         embed = discord.Embed(color=utils.randpastel_color(), description="")
-        if errs:
-            for err in errs:
-                embed.description += f"{err.id:0>5}: (Item: {err.item}) {err.timestamp:%m-%d-%Y} at {err.timestamp:%I:%M:%M %p} UTC\n\n"
+        if groups:
+            for group in groups:
+                embed.description += (
+                    f"{group.last_error:0>5}: {group.summary} (x{group.count}) "
+                    f"last seen {group.last_seen:%m-%d-%Y} at {group.last_seen:%I:%M:%M %p} UTC\n\n"
+                )
             await ctx.send(embed=embed)
         else:
             await ctx.send("No errors logged yet.")
 
+    @commands.command(aliases=('errs',))
+    @commands.is_owner()
+    async def errors(self, ctx: commands.Context, *, filters: ErrorFilters) -> None:
+        """Pages through the logged errors, newest first.
+
+        Parameters
+        ----------
+        filters : ErrorFilters
+            Optional filters, ``item:`` the command or item that raised the errors,
+            ``since:`` and ``until:`` ISO 8601 dates bounding when they were logged.
+        """
+        view = ErrorBrowserView(ctx.author, filters.to_query())
+        await view.load()
+        if not view.rows:
+            await ctx.send("No errors match those filters.")
+            return
+
+        view._update_state()
+        view.message = await ctx.send(embed=view.embed, view=view)
+
+    @commands.command(aliases=('es',))
+    @commands.is_owner()
+    async def errsearch(self, ctx: commands.Context, *, query: str) -> None:
+        """Searches the logged errors, best matches first.
+
+        Parameters
+        ----------
+        query : str
+            The words to search for, such as an exception's message.
+        """
+        results = await search_errors(query)
+        if not results:
+            await ctx.send("No errors match that search.")
+            return
+
+        embed = discord.Embed(title=f"Errors matching {query[:200]!r}", color=utils.randpastel_color(), description="")
+        for result in results:
+            snippet = " ".join(result.snippet.split())[:150]
+            embed.description += f"{result.id:0>5}: {snippet} ({result.item or 'unknown'})\n\n"
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def compresserrors(self, ctx: commands.Context) -> None:
+        """Compresses error tracebacks that were logged before they were stored compressed."""
+        async with ctx.typing():
+            report = await compress_tracebacks()
+        await ctx.send(str(report))
+
     @commands.command()
     @commands.is_owner()
     async def clearerrors(self, ctx: commands.Context) -> None:
         """Deletes all errors logged in the database except for the most recent."""
         await ctx.send(f"Are you sure you want to clear all of the logged errors? The most recent one will be kept. (y/N)")
-        msg = await self.bot.wait_for("message", check=lambda m: m.author.id == self.bot.owner_id)
+        try:
+            msg = await self.bot.wait_for(
+                "message", check=lambda m: m.author.id == ctx.author.id and m.channel.id == ctx.channel.id, timeout=30
+            )
+        except asyncio.TimeoutError:
+            await ctx.send("Took too long, aborted....")
+            return
 
         if msg.clean_content.lower().strip() == "y":
-            max_id = (await ErrorLog.all().order_by("-id").first()).id
-            deleted = await ErrorLog.filter(id__lt=max_id).delete()
-
-            await ctx.send(f"Deleted {deleted} logged errors.")
+            async with ctx.typing():
+                report = await self.prune(max_rows=1)
+            await ctx.send(str(report))
         else:
             await ctx.send("Aborted....")
 
@@ -7,8 +7,6 @@ from discord import app_commands
 from discord.app_commands import AppCommandError
 from discord.ext import commands
 
-from lib.dbmodels import ErrorLog
-
 _logger = logging.getLogger(__name__)
 
 
@@ -34,7 +32,7 @@ class ErrorHandler(commands.Cog):
 
         else:
             trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
-            errorlog = await ErrorLog.create(traceback=trace, item=f"Command: {interaction.command.name}")
+            errorlog = await self.bot.error_sink.log(trace, item=f"Command: {interaction.command.name}")
 
             _logger.error("Ignoring exception in app command {}:".format(interaction.command))
             _logger.error(trace)
@@ -103,9 +101,7 @@ class ErrorHandler(commands.Cog):
 
         else:
             trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
-            errorlog = await ErrorLog.create(traceback=trace, item=f"Command: {ctx.command.name}")
-
-            self.bot.dispatch("errorlog_create", errorlog)
+            errorlog = await self.bot.error_sink.log(trace, item=f"Command: {ctx.command.name}")
 
             _logger.error("Ignoring exception in command {}:".format(ctx.command))
             _logger.error(trace)
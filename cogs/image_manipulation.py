@@ -1,143 +1,169 @@
-import functools
 import io
 import logging
+import os
 import pathlib
-from typing import Union
+from typing import Any, Optional, Sequence, Union
 
 import discord
 from discord import app_commands
 from discord.ext import commands
-from PIL import Image, ImageDraw, ImageFont
 
+from lib.avatars import AvatarCache, cdn_size_for
+from lib.caching import ByteLRUCache
+from lib.encoding import EncodedImage
+from lib.render import TEMPLATES
+from lib.scheduler import RenderQueueFull, RenderScheduler
+from lib.templates import TemplateDef
 from utils.dynamic_cooldown_check import owner_cooldown_bypass
 
 _logger = logging.getLogger(__name__)
 
+AVATAR_TIMEOUT = 10.0  # seconds
+BUSY_MESSAGE = "I'm drawing a lot of pictures right now, try again in a few seconds!"
+
 
 class ImageManipulation(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self._slap_image_path = pathlib.Path("./cogs/base_images/slap.png")
-        self._do_stuff_image_path = pathlib.Path("./cogs/base_images/do_stuff.png")
 
-    async def get_pfp_in_bytes(self, user: Union[discord.User, discord.Member]) -> io.BytesIO:
-        """Get the users avatar in bytes
+        cache_dir = bot.config.get("avatar_cache_dir")
+        self.avatar_cache = AvatarCache(
+            max_bytes=bot.config.get("avatar_cache_bytes", 32 * 1024 * 1024),  # 32 MB
+            cache_dir=pathlib.Path(cache_dir) if cache_dir else None,
+            max_disk_bytes=bot.config.get("avatar_cache_disk_bytes", 256 * 1024 * 1024),  # 256 MB
+        )
+        # Finished images keyed by (template, avatar keys, render params).
+        self.render_cache = ByteLRUCache(bot.config.get("render_cache_bytes", 64 * 1024 * 1024))  # 64 MB
+        self.scheduler = RenderScheduler(
+            concurrency=bot.config.get("render_workers") or os.cpu_count() or 1,
+            max_queue=bot.config.get("render_queue_size", 32),
+        )
+        self._template_commands = [self.make_template_command(template) for template in TEMPLATES.values()]
+
+    async def cog_load(self) -> None:
+        for command in self._template_commands:
+            self.bot.tree.add_command(command)
+
+    async def cog_unload(self) -> None:
+        for command in self._template_commands:
+            self.bot.tree.remove_command(command.name)
+
+    def make_template_command(self, template: TemplateDef) -> app_commands.Command:
+        """Creates the slash command for a template.
 
         Parameters
         ----------
-        user : discord.User
-            The user of which will have their avatar converted to bytes
+        template : TemplateDef
+            The template to create the command for.
 
         Returns
         -------
-        io.BytesIO
-            A buffer containing the bytes of a User/Member's avatar
+        app_commands.Command
+            A command taking a target user, and whether to animate, that renders the template.
         """
-        av_bytesIO = io.BytesIO(await user.display_avatar.read())
-        av_bytesIO.seek(0)
-        return av_bytesIO
-
-    def generate_slap_image(self, sender: io.BytesIO, target: io.BytesIO) -> io.BytesIO:
-        """Generate the slap image with the sender and target avatars
-
-        Parameters
-        ----------
-        sender : io.BytesIO
-            The senders avatar in BytesIO
-        target : io.BytesIO
-            The targets avatar in BytesIO
-
-        Returns
-        -------
-        io.BytesIO
-            A buffer containing a `png` with the sender and target overlayed.
-        """
-        template_image = Image.open(self._slap_image_path)
-        sender_pfp = Image.open(sender)
-        target_pfp = Image.open(target)
-
-        if sender_pfp.mode != "RGB" or sender_pfp.mode != "RGBA":
-            sender_pfp = sender_pfp.convert("RGBA")
-
-        sender_pfp.thumbnail((128, 128))
-        template_image.paste(sender_pfp, (240, 60))
-
-        if target_pfp.mode != "RGB" or target_pfp.mode != "RGBA":
-            target_pfp = target_pfp.convert("RGBA")
-
-        target_pfp.thumbnail((128, 128))
-        template_image.paste(target_pfp, (0, 105))
-
-        # Get image into buffer and return
-        buffered_image = io.BytesIO()
-        template_image.save(buffered_image, "PNG")
-        buffered_image.seek(0)
-
-        return buffered_image
 
-    def generate_do_something_image(self, avatar: io.BytesIO) -> io.BytesIO:
-        """Generate the do stuff image with the users avata
+        async def callback(interaction: discord.Interaction, target: discord.User, animated: bool = False) -> None:
+            users = [interaction.user if slot.source == "author" else target for slot in template.slots]
+            # Only render an animation if there is something to animate.
+            animated = animated and any(user.display_avatar.is_animated() for user in users)
+
+            # Downloading the avatars and rendering can take longer than the three seconds an interaction
+            # has to be answered in, even with an empty queue, so only cached renders are sent straight away.
+            # Nothing is awaited between this check and the cache lookup in render.
+            if self.render_key(template.name, users, {"animated": animated}) not in self.render_cache:
+                # Cached renders never wait for the queue, so load is only shed for renders that would.
+                if self.scheduler.full:
+                    await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+                    return
+                await interaction.response.defer(thinking=True)
+
+            try:
+                image = await self.render(template.name, *users, guild_id=interaction.guild_id, animated=animated)
+            except RenderQueueFull:
+                if interaction.response.is_done():
+                    await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+                else:
+                    await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+                return
+
+            # BytesIO shares the bytes object's buffer instead of copying it.
+            file = discord.File(io.BytesIO(image.data), f"{template.name}.{image.extension}")
+            if interaction.response.is_done():
+                await interaction.followup.send(file=file)
+            else:
+                await interaction.response.send_message(file=file)
+
+        command = app_commands.Command(name=template.name, description=template.description, callback=callback)
+        app_commands.describe(target=template.target_description, animated="Use animated avatars, if there are any")(command)
+        app_commands.checks.dynamic_cooldown(owner_cooldown_bypass)(command)
+        return command
+
+    def render_key(
+        self, template: str, users: Sequence[Union[discord.User, discord.Member]], params: dict[str, Any]
+    ) -> tuple[Any, ...]:
+        """Gets the render cache key for a template rendered with the users' current avatars."""
+        return (template, tuple(user.display_avatar.key for user in users), tuple(sorted(params.items())))
+
+    async def render(
+        self,
+        template: str,
+        *users: Union[discord.User, discord.Member],
+        guild_id: Optional[int] = None,
+        **params: Any,
+    ) -> EncodedImage:
+        """Renders a template with the users avatars, reusing a previous render if nothing changed.
+
+        A cached render is returned without downloading any avatars or waiting for the render queue.
 
         Parameters
         ----------
-        avatar : io.BytesIO
-            The senders avatar
+        template : str
+            The name of the template to render.
+        *users : Union[discord.User, discord.Member]
+            The users whose avatars are pasted into the template, in slot order.
+        guild_id : Optional[int]
+            The guild the render is for, used to share the render queue fairly.
+        **params : Any
+            Any extra render parameters, these must be hashable. Passing ``animated=True`` also fetches
+            animated avatars as GIFs.
 
         Returns
         -------
-        io.BytesIO
-            A buffer containing a `png` with the avatar overlayed.
-        """
-        template_image = Image.open(self._do_stuff_image_path)
-
-        draw = ImageDraw.Draw(template_image)
-        font = ImageFont.truetype("./cogs/fonts/OpenSans-Regular.ttf", 54)
-        draw.text((140, 40), "C'mon,\ndo stuff...", 'black', font=font, align='center', stroke_width=2)
-
-        user_avatar = Image.open(avatar)
-
-        if user_avatar.mode != "RGB" or user_avatar.mode != "RGBA":
-            user_avatar = user_avatar.convert("RGBA")
-
-        user_avatar.thumbnail((240, 210))
-        template_image.paste(user_avatar, (220, 369))
-
-        buffered_image = io.BytesIO()
-        template_image.save(buffered_image, "PNG")
-        buffered_image.seek(0)
-
-        return buffered_image
-
-    @app_commands.command()
-    @app_commands.checks.dynamic_cooldown(owner_cooldown_bypass)
-    async def slap(self, interaction: discord.Interaction, target: discord.User) -> None:
-        """Slap someone!
+        EncodedImage
+            The encoded image.
 
-        Parameters
-        ----------
-        target : discord.User
-            Who do you want to slap?
-        """
-        sender_pfp_bytes = await self.get_pfp_in_bytes(interaction.user)
-        target_pfp_bytes = await self.get_pfp_in_bytes(target)
-        to_run = functools.partial(self.generate_slap_image, sender_pfp_bytes, target_pfp_bytes)
-        image: io.BytesIO = await self.bot.loop.run_in_executor(None, to_run)
-        await interaction.response.send_message(file=discord.File(image, "slap.png"))
-
-    @app_commands.command()
-    @app_commands.checks.dynamic_cooldown(owner_cooldown_bypass)
-    async def do_stuff(self, interaction: discord.Interaction, target: discord.User) -> None:
-        """C'mon, do stuff...
-
-        Parameters
-        ----------
-        target : discord.User
-            Who do you want to do stuff?
+        Raises
+        ------
+        RenderQueueFull
+            Too many renders are already waiting.
         """
-        avatar_bytes = await self.get_pfp_in_bytes(target or interaction.user)
-        to_run = functools.partial(self.generate_do_something_image, avatar_bytes)
-        image: io.BytesIO = await self.bot.loop.run_in_executor(None, to_run)
-        await interaction.response.send_message(file=discord.File(image, "do_stuff.png"))
+        key = self.render_key(template, users, params)
+        image = self.render_cache.lookup(key)
+        if image is not None:
+            return image
+
+        slots = TEMPLATES[template].slots
+        avatars = await self.avatar_cache.get_many(
+            [(user, cdn_size_for(slot.size)) for user, slot in zip(users, slots, strict=True)],
+            animated=params.get("animated", False),
+            timeout=AVATAR_TIMEOUT,
+        )
+        async with self.scheduler.slot(guild_id):
+            image = await self.bot.render_engine.render(template, *avatars, **params)
+        self.render_cache.store(key, image)
+        return image
+
+    @commands.command()
+    @commands.is_owner()
+    async def imagecache(self, ctx: commands.Context) -> None:
+        """Shows the avatar and render cache statistics, the render queue, and encode timings per template."""
+        encode_stats = "\n".join(f"{name}: {stats}" for name, stats in self.bot.render_engine.encode_stats.items())
+        await ctx.send(
+            f"Avatar cache: {self.avatar_cache}\n"
+            f"Render cache: {self.render_cache.stats} size={self.render_cache.currsize}/{self.render_cache.maxsize} bytes\n"
+            f"Render queue: {self.scheduler}\n"
+            f"{encode_stats}"
+        )
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -46,17 +46,17 @@ class ToPageModal(discord.ui.Modal, title="Go to page...t"):
         self.stop()
 
 
-class CommandsPaginatorView(discord.ui.View):
-    def __init__(self, owner: discord.Member | discord.User, paginator: commands.Paginator) -> None:
-        super().__init__(timeout=300)
-        assert len(paginator.pages) > 0
+class PaginatorView(discord.ui.View):
+    """The navigation buttons, owner check, quit button and timeout shared by paginators.
+
+    Subclasses implement ``show_first``, ``show_previous``, ``show_next`` and ``show_last``,
+    and keep the buttons' state up to date.
+    """
+
+    def __init__(self, owner: discord.Member | discord.User, *, timeout: float = 300) -> None:
+        super().__init__(timeout=timeout)
         self.message: discord.Message | None = None  # should be set when the paginator is sent.
         self.owner = owner
-        self.paginator = paginator
-        self.max_index = len(paginator.pages) - 1  # List indecies
-        self.current_index = 0
-
-        self._update_state()
 
     async def on_timeout(self) -> None:
         _logger.debug(f"{self!r} timed out.")
@@ -79,6 +79,61 @@ class CommandsPaginatorView(discord.ui.View):
         await interaction.response.send_message(f"This paginator belongs to {self.owner.mention}.", ephemeral=True)
         return False
 
+    async def show_first(self, interaction: discord.Interaction) -> None:
+        raise NotImplementedError
+
+    async def show_previous(self, interaction: discord.Interaction) -> None:
+        raise NotImplementedError
+
+    async def show_next(self, interaction: discord.Interaction) -> None:
+        raise NotImplementedError
+
+    async def show_last(self, interaction: discord.Interaction) -> None:
+        raise NotImplementedError
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.gray, disabled=True)
+    async def to_first_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        _logger.debug(f"{self!r} to_first_btn clicked.")
+        await self.show_first(interaction)
+
+    @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.green, disabled=True)
+    async def back_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        _logger.debug(f"{self!r} back_btn clicked.")
+        await self.show_previous(interaction)
+
+    @discord.ui.button(label="1", style=discord.ButtonStyle.blurple, disabled=True)
+    async def count_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        _logger.debug(f"{self!r} count_btn clicked.")
+        # Should never be called. Just defer in case it gets called.
+        await interaction.response.defer()
+
+    @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.green)
+    async def fwd_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        _logger.debug(f"{self!r} fwd_btn clicked.")
+        await self.show_next(interaction)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.gray)
+    async def to_last_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        _logger.debug(f"{self!r} to_last_btn clicked.")
+        await self.show_last(interaction)
+
+    @discord.ui.button(label="Quit", style=discord.ButtonStyle.red)
+    async def stop_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        # Goes through the scheduler too, so a page edit that's still pending can't bring the buttons back.
+        await interaction.client.edit_scheduler.respond(interaction, interaction.message, view=None)  # type: ignore
+        self.stop()
+
+
+class CommandsPaginatorView(PaginatorView):
+    def __init__(self, owner: discord.Member | discord.User, paginator: commands.Paginator) -> None:
+        super().__init__(owner)
+        assert len(paginator.pages) > 0
+        self.paginator = paginator
+        self.max_index = len(paginator.pages) - 1  # List indecies
+        self.current_index = 0
+
+        self._update_state()
+
     def _update_state(self) -> None:
         _logger.debug(f"{self!r} _update called.")
         # Disable unusable buttons
@@ -105,37 +160,28 @@ class CommandsPaginatorView(discord.ui.View):
     async def update(self, interaction: discord.Interaction) -> None:
         _logger.debug(f"{self!r} update called.")
         self._update_state()
-        await interaction.response.edit_message(content=self.paginator.pages[self.current_index], view=self)
-
-    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.gray, disabled=True)
-    async def to_first_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        _logger.debug(f"{self!r} to_first_btn clicked.")
+        message = interaction.message or self.message
+        assert message is not None
+        # Fast clicking only sends the page the owner ends up on.
+        await interaction.client.edit_scheduler.respond(  # type: ignore
+            interaction, message, content=self.paginator.pages[self.current_index], view=self
+        )
+
+    async def show_first(self, interaction: discord.Interaction) -> None:
         self.current_index = 0
         await self.update(interaction)
 
-    @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.green, disabled=True)
-    async def back_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        _logger.debug(f"{self!r} back_btn clicked.")
+    async def show_previous(self, interaction: discord.Interaction) -> None:
         if self.current_index >= 1:
             self.current_index -= 1
         await self.update(interaction)
 
-    @discord.ui.button(label="1", style=discord.ButtonStyle.blurple, disabled=True)
-    async def count_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        _logger.debug(f"{self!r} count_btn clicked.")
-        # Should never be called. Just defer in case it gets called.
-        await interaction.response.defer()
-
-    @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.green)
-    async def fwd_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        _logger.debug(f"{self!r} fwd_btn clicked.")
+    async def show_next(self, interaction: discord.Interaction) -> None:
         if self.current_index < self.max_index:
             self.current_index += 1
         await self.update(interaction)
 
-    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.gray)
-    async def to_last_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        _logger.debug(f"{self!r} to_last_btn clicked.")
+    async def show_last(self, interaction: discord.Interaction) -> None:
         self.current_index = self.max_index
         await self.update(interaction)
 
@@ -171,11 +217,6 @@ class CommandsPaginatorView(discord.ui.View):
         self.current_index = value - 1  # Our index is one lower than theirs
         await self.update(modal.interaction)
 
-    @discord.ui.button(label="Quit", style=discord.ButtonStyle.red)
-    async def stop_btn(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
-        await interaction.response.edit_message(view=None)
-        self.stop()
-
 
 class PyTest(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import logging
+import os
+import pathlib
+from typing import Optional, Sequence, Union
+
+import discord
+from cachetools import LRUCache
+
+from .caching import ByteLRUCache, CacheStats
+
+__all__ = (
+    'cdn_size_for',
+    'AvatarCache',
+)
+
+_logger = logging.getLogger(__name__)
+
+MIN_CDN_SIZE = 16
+MAX_CDN_SIZE = 4096
+
+
+def cdn_size_for(slot: tuple[int, int]) -> int:
+    """Gets the smallest size the CDN serves that covers a slot.
+
+    Parameters
+    ----------
+    slot : tuple[int, int]
+        The width and height the avatar will be shrunk to fit.
+
+    Returns
+    -------
+    int
+        A power of two between 16 and 4096.
+    """
+    needed = max(slot)
+    size = MIN_CDN_SIZE
+    while size < needed and size < MAX_CDN_SIZE:
+        size *= 2
+    return size
+
+
+class AvatarCache:
+    """A content-addressed cache of avatar bytes.
+
+    Avatars are keyed by their asset hash and the requested size, so an entry never goes stale;
+    when a user's avatar hash changes the entries for their old hash are dropped. An optional
+    on-disk tier keeps avatars across restarts, evicting the least recently used files once it
+    holds more than ``max_disk_bytes``.
+
+    Avatars are fetched as static PNGs unless an animated avatar is asked for as a GIF.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The maximum number of bytes to hold in memory.
+    cache_dir : Optional[pathlib.Path]
+        The directory for the on-disk tier, disabled if None.
+    max_disk_bytes : int
+        The maximum number of bytes to keep on disk, defaults to 256 MiB.
+    """
+
+    def __init__(
+        self, *, max_bytes: int, cache_dir: Optional[pathlib.Path] = None, max_disk_bytes: int = 256 * 1024 * 1024
+    ) -> None:
+        self._memory = ByteLRUCache(max_bytes)
+        self._current_keys: LRUCache = LRUCache(maxsize=16384)  # user id -> (avatar key, cache keys)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.coalesced = 0
+        self._inflight: dict[str, asyncio.Task[bytes]] = {}
+        # Cache key -> file size for the on-disk tier, least recently used first.
+        self._disk_index: collections.OrderedDict[str, int] = collections.OrderedDict()
+        self._disk_bytes = 0
+
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._memory.stats
+
+    def __str__(self) -> str:
+        text = (
+            f"{self.stats} disk_hits={self.disk_hits} coalesced={self.coalesced} "
+            f"size={self._memory.currsize}/{self._memory.maxsize} bytes"
+        )
+        if self.cache_dir is not None:
+            text += f" disk={self._disk_bytes}/{self.max_disk_bytes} bytes disk_evictions={self.disk_evictions}"
+        return text
+
+    def _disk_path(self, key: str) -> pathlib.Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / f"{key}.bin"
+
+    def _scan_disk(self) -> None:
+        """Indexes the files left by earlier runs, oldest first, and trims them to the size limit."""
+        assert self.cache_dir is not None
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".tmp":
+                # Left behind by a write that was interrupted.
+                path.unlink(missing_ok=True)
+            elif path.suffix == ".bin":
+                stat = path.stat()
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        for key in self._evict_disk():
+            self._remove_disk(key)
+        _logger.debug(f"Found {len(self._disk_index)} cached avatars on disk ({self._disk_bytes} bytes).")
+
+    def _evict_disk(self) -> list[str]:
+        """Drops the least recently used files from the index until it fits, returning their keys."""
+        evicted = []
+        while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(key)
+        self.disk_evictions += len(evicted)
+        return evicted
+
+    def _forget_disk(self, key: str) -> None:
+        self._disk_bytes -= self._disk_index.pop(key, 0)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # The modification time orders the files by use when they're indexed again after a restart.
+        os.utime(path)
+        return data
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    def _remove_disk(self, key: str) -> None:
+        self._disk_path(key).unlink(missing_ok=True)
+
+    async def _track(self, user_id: int, avatar_key: str, cache_key: str) -> None:
+        old_avatar_key, cache_keys = self._current_keys.get(user_id, (None, set()))
+        if old_avatar_key != avatar_key:
+            if old_avatar_key is not None:
+                _logger.debug(f"Avatar for {user_id=} changed ({old_avatar_key} -> {avatar_key}), dropping old entries.")
+                for stale in cache_keys:
+                    self._memory.pop(stale, None)
+                    if self.cache_dir is not None:
+                        self._forget_disk(stale)
+                        await asyncio.to_thread(self._remove_disk, stale)
+            cache_keys = set()
+
+        cache_keys.add(cache_key)
+        self._current_keys[user_id] = (avatar_key, cache_keys)
+
+    async def _load(self, asset: discord.Asset, key: str) -> bytes:
+        if self.cache_dir is not None:
+            data = await asyncio.to_thread(self._read_disk, key)
+            if data is not None:
+                self.disk_hits += 1
+                if key in self._disk_index:
+                    self._disk_index.move_to_end(key)
+                self._memory.store(key, data)
+                return data
+            self._forget_disk(key)
+
+        data = await asset.read()
+        self._memory.store(key, data)
+        if self.cache_dir is not None and len(data) <= self.max_disk_bytes:
+            await asyncio.to_thread(self._write_disk, key, data)
+            # The index is only touched from the event loop, the threads just do the file work.
+            self._forget_disk(key)
+            self._disk_index[key] = len(data)
+            self._disk_bytes += len(data)
+            for evicted in self._evict_disk():
+                await asyncio.to_thread(self._remove_disk, evicted)
+
+        return data
+
+    def _finish_download(self, key: str, task: asyncio.Task[bytes]) -> None:
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            _logger.warning(f"Downloading avatar {key} failed: {task.exception()!r}")
+
+    async def get(
+        self,
+        user: Union[discord.User, discord.Member],
+        *,
+        size: int = 1024,
+        animated: bool = False,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        """Gets a user's avatar, downloading it only if it isn't cached.
+
+        Concurrent requests for the same avatar share a single download. A waiter being
+        cancelled or timing out does not affect the download or the other waiters.
+
+        Parameters
+        ----------
+        user : Union[discord.User, discord.Member]
+            The user whose avatar to get.
+        size : int
+            The size to request from the CDN, must be a power of two between 16 and 4096.
+        animated : bool
+            Whether to get animated avatars as a GIF instead of their first frame.
+        timeout : Optional[float]
+            How long to wait for the avatar, waits forever if None.
+
+        Returns
+        -------
+        bytes
+            The avatar image as a PNG, or a GIF if it is animated and ``animated`` was passed.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            The avatar wasn't fetched in time.
+        """
+        fmt = "gif" if animated and user.display_avatar.is_animated() else "png"
+        asset = user.display_avatar.replace(size=size, format=fmt)
+        key = f"{asset.key}-{size}" if fmt == "png" else f"{asset.key}-{size}-{fmt}"
+        await self._track(user.id, asset.key, key)
+
+        data = self._memory.lookup(key)
+        if data is not None:
+            return data
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(asset, key))
+            task.add_done_callback(functools.partial(self._finish_download, key))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    async def get_many(
+        self,
+        requests: Sequence[tuple[Union[discord.User, discord.Member], int]],
+        *,
+        animated: bool = False,
+        timeout: Optional[float] = None,
+    ) -> list[bytes]:
+        """Gets several avatars concurrently.
+
+        Parameters
+        ----------
+        requests : Sequence[tuple[Union[discord.User, discord.Member], int]]
+            The users and the sizes to get their avatars at.
+        animated : bool
+            Whether to get animated avatars as a GIF instead of their first frame.
+        timeout : Optional[float]
+            How long to wait for each avatar, waits forever if None.
+
+        Returns
+        -------
+        list[bytes]
+            The avatars, in the same order as requested.
+        """
+        return list(
+            await asyncio.gather(
+                *(self.get(user, size=size, animated=animated, timeout=timeout) for user, size in requests)
+            )
+        )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+from cachetools import LRUCache
+
+__all__ = (
+    'CacheStats',
+    'ByteLRUCache',
+)
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """Counters describing how well a cache is doing."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return f"hits={self.hits} misses={self.misses} evictions={self.evictions} ratio={self.hit_ratio:.2%}"
+
+
+class ByteLRUCache(LRUCache):
+    """An LRU cache bounded by the total size of its values in bytes.
+
+    Values must support ``len()``. Anything larger than the whole cache is silently not stored.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The total number of bytes the cache may hold before evicting.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(maxsize=max_bytes, getsizeof=len)
+        self.stats = CacheStats()
+
+    def popitem(self) -> tuple[Any, Any]:
+        item = super().popitem()
+        self.stats.evictions += 1
+        return item
+
+    def lookup(self, key: Hashable) -> Optional[Any]:
+        """Gets a value from the cache, updating the hit/miss counters.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key to look up.
+
+        Returns
+        -------
+        Optional[Any]
+            The cached value, if any.
+        """
+        value = self.get(key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def store(self, key: Hashable, value: Any) -> bool:
+        """Stores a value in the cache if it fits.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key to store the value under.
+        value : Any
+            The value to store.
+
+        Returns
+        -------
+        bool
+            Whether the value was stored.
+        """
+        try:
+            self[key] = value
+        except ValueError:
+            _logger.debug(f"Not caching {key!r}, {len(value)} bytes is larger than the cache ({self.maxsize} bytes).")
+            return False
+        return True
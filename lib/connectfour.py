@@ -0,0 +1,478 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+__all__ = (
+    'BitBoard',
+    'Difficulty',
+    'solve',
+    'ConnectFourSolver',
+)
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class _Geometry:
+    """Masks and shifts shared by every board of the same shape."""
+
+    columns: int
+    rows: int
+    connect: int
+    height: int
+    bottom: int  # The bottom cell of every column
+    board_mask: int  # Every cell, without the empty bit on top of each column
+    column_masks: tuple[int, ...]
+    order: tuple[int, ...]  # Columns from the centre out
+    directions: tuple[int, ...]  # Bit shifts for vertical, horizontal, then both diagonals
+
+
+@functools.lru_cache(maxsize=32)
+def _geometry(columns: int, rows: int, connect: int) -> _Geometry:
+    height = rows + 1
+    bottom = sum(1 << (column * height) for column in range(columns))
+    return _Geometry(
+        columns=columns,
+        rows=rows,
+        connect=connect,
+        height=height,
+        bottom=bottom,
+        board_mask=bottom * ((1 << rows) - 1),
+        column_masks=tuple(((1 << rows) - 1) << (column * height) for column in range(columns)),
+        # Moves near the centre take part in more lines, so they are usually better.
+        order=tuple(sorted(range(columns), key=lambda column: abs(column - (columns - 1) / 2))),
+        directions=(1, height, height - 1, height + 1),
+    )
+
+
+def _runs(bits: int, shift: int, length: int) -> int:
+    """Gets the cells that start a line of ``length`` set bits going in the direction of ``shift``.
+
+    Takes about log2(length) steps by doubling the line length each time.
+    """
+    run = 1
+    while run * 2 <= length:
+        bits &= bits >> (run * shift)
+        run *= 2
+    if run < length:
+        # Two overlapping lines of ``run`` cover ``length`` since ``length - run <= run``.
+        bits &= bits >> ((length - run) * shift)
+    return bits
+
+
+def _winning_cells(geometry: _Geometry, position: int, mask: int) -> int:
+    """Gets the empty cells that would give the owner of ``position`` a full line."""
+    connect = geometry.connect
+    cells = 0
+    for shift in geometry.directions:
+        # starts[n] holds the cells that start a line of n pieces, -1 is every cell for n = 0.
+        starts = [-1, position]
+        for length in range(2, connect):
+            starts.append(starts[-1] & (position >> ((length - 1) * shift)))
+
+        # A cell wins when ``before`` pieces end right below it and the rest start right after it.
+        for before in range(connect):
+            cells |= (starts[before] << (before * shift)) & (starts[connect - 1 - before] >> shift)
+    return cells & (geometry.board_mask ^ mask)
+
+
+class BitBoard:
+    """A Connect Four position stored as two bitboards, one per player.
+
+    Each column takes ``rows + 1`` bits, bottom row first, the extra bit at the top of every
+    column is always empty so shifting a board never carries pieces from one column into the next.
+    Playing a move is a couple of integer operations and win detection is a handful of shifts
+    and masks, no matter the board size or how many pieces have to line up.
+
+    Players are numbered 0 and 1.
+
+    Parameters
+    ----------
+    columns : int
+        The number of columns, defaults to 7.
+    rows : int
+        The number of rows, defaults to 6.
+    connect : int
+        How many pieces in a row win, defaults to 4.
+    """
+
+    __slots__ = ('columns', 'rows', 'connect', 'moves', '_masks', '_heights', '_geometry')
+
+    def __init__(self, columns: int = 7, rows: int = 6, connect: int = 4) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.connect = connect
+        self.moves = 0
+        self._geometry = _geometry(columns, rows, connect)
+        self._masks = [0, 0]
+        # The bit index the next piece dropped in each column goes to.
+        self._heights = [column * (rows + 1) for column in range(columns)]
+
+    def can_play(self, column: int) -> bool:
+        return self._heights[column] < column * (self.rows + 1) + self.rows
+
+    def play(self, column: int, player: int) -> Optional[int]:
+        """Drops a piece into a column.
+
+        Parameters
+        ----------
+        column : int
+            The column to drop the piece in, starting from 0 on the left.
+        player : int
+            The player the piece belongs to.
+
+        Returns
+        -------
+        Optional[int]
+            The row the piece landed in counting from 0 at the bottom, None if the column is full.
+        """
+        if not self.can_play(column):
+            return None
+
+        bit = self._heights[column]
+        self._masks[player] |= 1 << bit
+        self._heights[column] += 1
+        self.moves += 1
+        return bit - column * (self.rows + 1)
+
+    def is_full(self) -> bool:
+        return self.moves == self.columns * self.rows
+
+    def is_win(self, player: int) -> bool:
+        """Checks whether a player has ``connect`` in a row.
+
+        Parameters
+        ----------
+        player : int
+            The player to check.
+
+        Returns
+        -------
+        bool
+            Whether the player has won.
+        """
+        board = self._masks[player]
+        return any(_runs(board, shift, self.connect) for shift in self._geometry.directions)
+
+    def key(self, player: int) -> int:
+        """Gets a number that identifies the position with ``player`` to move."""
+        return self._masks[player] + (self._masks[0] | self._masks[1])
+
+    def cell(self, column: int, row: int) -> Optional[int]:
+        """Gets the player with a piece in a cell.
+
+        Parameters
+        ----------
+        column : int
+            The column, starting from 0 on the left.
+        row : int
+            The row, starting from 0 at the bottom.
+
+        Returns
+        -------
+        Optional[int]
+            The player, None if the cell is empty.
+        """
+        bit = 1 << (column * (self.rows + 1) + row)
+        if self._masks[0] & bit:
+            return 0
+        if self._masks[1] & bit:
+            return 1
+        return None
+
+
+WIN_SCORE = 1_000_000
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time budget runs out."""
+
+
+class _Search:
+    """Negamax with alpha-beta pruning and a transposition table.
+
+    Positions are ``(position, mask)`` pairs from the point of view of the player to move:
+    ``position`` holds their pieces and ``mask`` holds every piece, laid out like :class:`BitBoard`.
+    """
+
+    def __init__(self, geometry: _Geometry, deadline: float) -> None:
+        self.geometry = geometry
+        self.cells = geometry.columns * geometry.rows
+        self.deadline = deadline
+        self.nodes = 0
+        self.bottom = geometry.bottom
+        self.board_mask = geometry.board_mask
+        self.column_masks = geometry.column_masks
+        self.order = geometry.order
+        # (position + mask) -> (depth, flag, score, best column)
+        self.table: dict[int, tuple[int, int, int, int]] = {}
+
+    def winning_cells(self, position: int, mask: int) -> int:
+        return _winning_cells(self.geometry, position, mask)
+
+    def evaluate(self, position: int, mask: int) -> int:
+        ours = self.winning_cells(position, mask).bit_count()
+        theirs = self.winning_cells(position ^ mask, mask).bit_count()
+        return ours - theirs
+
+    def negamax(self, position: int, mask: int, moves: int, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if moves == self.cells:
+            return 0
+
+        possible = (mask + self.bottom) & self.board_mask
+        if self.winning_cells(position, mask) & possible:
+            return WIN_SCORE - moves - 1
+
+        if depth == 0:
+            return self.evaluate(position, mask)
+
+        opponent_wins = self.winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -(WIN_SCORE - moves - 2)  # Two threats, can't block both
+            possible = forced
+        possible &= ~(opponent_wins >> 1)  # Never play right below an opponent's winning cell
+        if not possible:
+            return -(WIN_SCORE - moves - 2)
+
+        original_alpha = alpha
+        key = position + mask
+        best_column = -1
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, flag, score, best_column = entry
+            if entry_depth >= depth:
+                if flag == 0:
+                    return score
+                elif flag == 1:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        order = self.order if best_column < 0 else [best_column, *(c for c in self.order if c != best_column)]
+        best = -WIN_SCORE - 1
+        for column in order:
+            move = possible & self.column_masks[column]
+            if not move:
+                continue
+
+            score = -self.negamax(position ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best:
+                best, best_column = score, column
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        flag = 0 if original_alpha < best < beta else (1 if best >= beta else 2)
+        self.table[key] = (depth, flag, best, best_column)
+        return best
+
+    def best_move(self, position: int, mask: int, moves: int, depth: int) -> tuple[int, int]:
+        possible = (mask + self.bottom) & self.board_mask
+        best_column, best = -1, -WIN_SCORE - 1
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+
+        entry = self.table.get(position + mask)
+        order = self.order if entry is None else [entry[3], *(c for c in self.order if c != entry[3])]
+        for column in order:
+            move = possible & self.column_masks[column]
+            if not move:
+                continue
+
+            if self.winning_cells(position, mask) & move:
+                return column, WIN_SCORE - moves - 1
+
+            score = -self.negamax(position ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best:
+                best, best_column = score, column
+            alpha = max(alpha, score)
+
+        return best_column, best
+
+
+def solve(board: BitBoard, player: int, *, max_depth: int, time_limit: float) -> tuple[int, int]:
+    """Finds the best move for a player with an iteratively deepened search.
+
+    The deepest search that finished within the time limit decides the move.
+
+    Parameters
+    ----------
+    board : BitBoard
+        The position to search.
+    player : int
+        The player to move.
+    max_depth : int
+        How many moves ahead to look at most.
+    time_limit : float
+        How many seconds the search may take.
+
+    Returns
+    -------
+    tuple[int, int]
+        The column to play and the depth that was completely searched.
+    """
+    search = _Search(board._geometry, time.perf_counter() + time_limit)
+    position = board._masks[player]
+    mask = board._masks[0] | board._masks[1]
+    remaining = board.columns * board.rows - board.moves
+
+    # Fall back to the most central legal move if not even a depth 1 search finishes.
+    best_column = next(column for column in search.order if board.can_play(column))
+    completed = 0
+    for depth in range(1, min(max_depth, remaining) + 1):
+        try:
+            column, score = search.best_move(position, mask, board.moves, depth)
+        except SearchTimeout:
+            break
+
+        best_column, completed = column, depth
+        if abs(score) >= WIN_SCORE - board.columns * board.rows:
+            break  # The result is already known, looking deeper won't change it
+
+    return best_column, completed
+
+
+class Difficulty(Enum):
+    """How hard the bot plays, as the deepest search it may do and the seconds it may take."""
+
+    easy = (2, 0.5)
+    medium = (6, 1.0)
+    hard = (42, 3.0)
+
+
+def _center_move(board: BitBoard) -> int:
+    return min(
+        (column for column in range(board.columns) if board.can_play(column)),
+        key=lambda column: abs(column - (board.columns - 1) / 2),
+    )
+
+
+class ConnectFourSolver:
+    """Picks the bot's Connect Four moves, searching in worker processes.
+
+    A search holds the GIL for its whole time budget, so it can't run on the event loop or in a thread.
+    Searches stop themselves once their budget is spent, if one still hasn't returned shortly after,
+    or fails, the most central legal move is played instead.
+
+    Optionally keeps an opening book, a JSON file of positions to the move a deep search picked for them,
+    so early moves that were already searched are instant.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of worker processes, defaults to 1.
+    book_path : Optional[str]
+        Where the opening book is stored, None to not keep one.
+    """
+
+    # Extra seconds a search gets past its own budget before it's given up on.
+    GRACE = 1.0
+    # Only results from searches at least this deep, this early in the game, go in the book.
+    BOOK_MIN_DEPTH = 12
+    BOOK_MAX_MOVES = 8
+
+    def __init__(self, *, max_workers: int = 1, book_path: Optional[str] = None) -> None:
+        self._max_workers = max_workers
+        self._pool = self._new_pool()
+        self._book_path = book_path
+        self._book: dict[str, int] = {}
+        self._book_changed = False
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _book_key(self, board: BitBoard, player: int) -> str:
+        return f"{board.columns}x{board.rows}c{board.connect}:{board.key(player)}"
+
+    def _read_book(self) -> dict[str, int]:
+        assert self._book_path is not None
+        try:
+            with open(self._book_path) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return {}
+
+    def _write_book(self) -> None:
+        assert self._book_path is not None
+        tmp_path = f"{self._book_path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(self._book, fp)
+        os.replace(tmp_path, self._book_path)
+
+    async def load(self) -> None:
+        """Reads the opening book, if there is one."""
+        if self._book_path is None:
+            return
+
+        self._book = await asyncio.to_thread(self._read_book)
+        _logger.info(f"Loaded {len(self._book)} Connect Four opening book positions.")
+
+    async def best_move(self, board: BitBoard, player: int, difficulty: Difficulty) -> int:
+        """Picks a move for a player.
+
+        Parameters
+        ----------
+        board : BitBoard
+            The position to move in.
+        player : int
+            The player to move.
+        difficulty : Difficulty
+            How hard to search.
+
+        Returns
+        -------
+        int
+            The column to play.
+        """
+        key = self._book_key(board, player)
+        column = self._book.get(key)
+        if column is not None and board.can_play(column):
+            return column
+
+        max_depth, time_limit = difficulty.value
+        future = self._pool.submit(solve, board, player, max_depth=max_depth, time_limit=time_limit)
+        try:
+            column, depth = await asyncio.wait_for(asyncio.wrap_future(future), time_limit + self.GRACE)
+        except asyncio.TimeoutError:
+            _logger.warning(f"A {difficulty.name} Connect Four search ran past its {time_limit}s budget.")
+            return _center_move(board)
+        except BrokenProcessPool:
+            # A worker died, every later search would fail the same way until the pool is replaced.
+            _logger.exception("A Connect Four solver worker died, starting new ones.")
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+            return _center_move(board)
+        except Exception:
+            _logger.exception(f"A {difficulty.name} Connect Four search failed.")
+            return _center_move(board)
+
+        if self._book_path is not None and depth >= self.BOOK_MIN_DEPTH and board.moves < self.BOOK_MAX_MOVES:
+            self._book[key] = column
+            self._book_changed = True
+
+        return column
+
+    async def close(self) -> None:
+        """Stops the worker processes and saves the opening book."""
+        _logger.info("Shutting down the Connect Four solver.")
+        await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+        if self._book_path is not None and self._book_changed:
+            await asyncio.to_thread(self._write_book)
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import io
 import logging
+import zlib
+from typing import Any, Optional, Union
 
 import discord
 from tortoise import fields
@@ -11,12 +13,86 @@ from . import utils
 
 _logger = logging.getLogger(__name__)
 
+
+class CompressedTextField(fields.BinaryField):
+    """A text field that's stored zlib compressed.
+
+    Values are compressed on the way into the database and decompressed on the way out, so the
+    model sees plain strings. Values that compression wouldn't shrink, and values written before
+    compression was added, are stored and read as they are.
+    """
+
+    def to_db_value(self, value: Any, instance: Any) -> Optional[bytes]:
+        if isinstance(value, str):
+            raw = value.encode("UTF-8")
+            compressed = zlib.compress(raw)
+            return compressed if len(compressed) < len(raw) else raw
+        return value
+
+    def to_python_value(self, value: Any) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_text(value)
+
+
+def decompress_text(value: Union[str, bytes, memoryview]) -> str:
+    """Decompresses a value stored by :class:`CompressedTextField`, values that aren't compressed are decoded as is."""
+    if isinstance(value, str):
+        return value  # SQLite returns text stored before compression was added as it is
+    value = bytes(value)
+    try:
+        return zlib.decompress(value).decode("UTF-8") if value else ""
+    except zlib.error:
+        return value.decode("UTF-8")
+
+class ErrorGroup(Model):
+    """Represents every logged error with the same traceback, ignoring line numbers, addresses and snowflakes."""
+    id = fields.BigIntField(pk=True, generated=True)
+    fingerprint = fields.CharField(max_length=40, unique=True)
+    traceback = CompressedTextField(null=False)  # The first occurrence's traceback
+    summary = fields.CharField(max_length=200)  # The last line of the traceback
+    count = fields.IntField(default=0)
+    first_seen = fields.DatetimeField()
+    last_seen = fields.DatetimeField(index=True)
+    last_error = fields.BigIntField()  # The id of the latest occurrence
+
+    errors: fields.ReverseRelation[ErrorLog]
+
+
 class ErrorLog(Model):
     """Represents a logged error."""
     id = fields.BigIntField(pk=True, generated=True)
     timestamp = fields.DatetimeField(auto_now_add=True)
-    traceback = fields.TextField(null=False)
+    # Only the first few occurrences of a group keep their traceback, it's empty for the rest.
+    traceback = CompressedTextField(null=False)
+    summary = fields.CharField(max_length=200, null=True)  # This occurrence's own last line of the traceback
     item = fields.TextField(null=True)
+    group: fields.ForeignKeyNullableRelation[ErrorGroup] = fields.ForeignKeyField(
+        "models.ErrorGroup", related_name="errors", null=True, on_delete=fields.SET_NULL
+    )
+
+    class Meta:
+        # The id is last so pages of filtered errors are read straight from the index, newest first.
+        indexes = (("item", "id"), ("timestamp", "id"))
+
+    @property
+    def trace(self) -> str:
+        """The traceback of this error, or of its group if this occurrence wasn't kept as a sample.
+
+        The group's traceback ends with this occurrence's own last line, since groups ignore the
+        line numbers, addresses and snowflakes that can differ there. The group has to be fetched
+        for the fallback to work.
+        """
+        if self.traceback:
+            return self.traceback
+        group = self.group
+        if not isinstance(group, ErrorGroup):
+            return ""
+
+        lines = group.traceback.rstrip().splitlines()
+        if lines and self.summary:
+            lines[-1] = self.summary
+        return "\n".join(lines)
 
     @property
     def embed(self) -> discord.Embed:
@@ -28,7 +104,7 @@ class ErrorLog(Model):
             The generated Embed.
         """
         embed = discord.Embed(title=f"Error #{self.id}{f' (Item/Command: {self.item})' if self.item is not None else ''}", color=utils.randpastel_color())
-        embed.description = f"```{self.traceback[:5500]}```"
+        embed.description = f"```{self.trace[:5500]}```"
         embed.set_footer(text=f"Occurred On: {self.timestamp:%m-%d-%Y} at {self.timestamp:%I:%M:%M %p} UTC")
 
         return embed
@@ -50,7 +126,7 @@ class ErrorLog(Model):
         output = (
             f"Error #{self.id}{f' (Item/Command: {self.item})' if self.item is not None else ''}\n"
             f"Occurred On: {self.timestamp:%m-%d-%Y} at {self.timestamp:%I:%M:%M %p} UTC\n"
-            f"{self.traceback}\n"
+            f"{self.trace}\n"
         )
         return output
 
@@ -61,3 +137,92 @@ class ErrorLog(Model):
         output.seek(0)
 
         return output
+
+
+class ConnectFourGame(Model):
+    """Represents an unfinished Connect Four game."""
+    id = fields.BigIntField(pk=True, generated=True)
+    channel_id = fields.BigIntField()
+    message_id = fields.BigIntField(null=True)
+    player_one = fields.BigIntField()
+    player_two = fields.BigIntField()
+    moves = fields.BinaryField()  # The columns played, in order
+    difficulty = fields.CharField(max_length=16, null=True)  # Set when player two is the bot
+    columns = fields.SmallIntField(default=7)
+    rows = fields.SmallIntField(default=6)
+    connect = fields.SmallIntField(default=4)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+
+class ConnectFourRecord(Model):
+    """Represents a finished Connect Four game."""
+    id = fields.BigIntField(pk=True, generated=True)
+    player_one = fields.BigIntField(index=True)
+    player_two = fields.BigIntField(index=True)
+    winner = fields.BigIntField(null=True)  # None for a tie
+    forfeit = fields.BooleanField(default=False)  # The loser ran out of time
+    moves = fields.BinaryField()
+    columns = fields.SmallIntField(default=7)
+    rows = fields.SmallIntField(default=6)
+    connect = fields.SmallIntField(default=4)
+    difficulty = fields.CharField(max_length=16, null=True)
+    ended_at = fields.DatetimeField(auto_now_add=True)
+
+
+class ConnectFourStats(Model):
+    """Represents a user's Connect Four results, kept up to date as games end."""
+    user_id = fields.BigIntField(pk=True, generated=False)
+    wins = fields.IntField(default=0)
+    losses = fields.IntField(default=0)
+    draws = fields.IntField(default=0)
+    streak = fields.IntField(default=0)  # Current win streak
+    best_streak = fields.IntField(default=0)
+    rating = fields.IntField(default=1000, index=True)
+
+    RATING_K = 32
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+    def add_result(self, score: float, opponent_rating: int) -> None:
+        """Counts a finished game and updates the Elo rating.
+
+        Parameters
+        ----------
+        score : float
+            1 for a win, 0.5 for a draw and 0 for a loss.
+        opponent_rating : int
+            The opponent's rating before the game.
+        """
+        expected = 1 / (1 + 10 ** ((opponent_rating - self.rating) / 400))
+        self.rating += round(self.RATING_K * (score - expected))
+
+        if score == 1:
+            self.wins += 1
+            self.streak += 1
+            self.best_streak = max(self.best_streak, self.streak)
+        elif score == 0:
+            self.losses += 1
+            self.streak = 0
+        else:
+            self.draws += 1
+            self.streak = 0
+
+    @property
+    def embed(self) -> discord.Embed:
+        """Generates an Embed that shows these stats.
+
+        Returns
+        -------
+        discord.Embed
+            The generated Embed.
+        """
+        embed = discord.Embed(title="Connect Four Stats", color=utils.randpastel_color())
+        embed.description = (
+            f"<@{self.user_id}>\n\n"
+            f"**Rating:** {self.rating}\n"
+            f"**Games:** {self.games} ({self.wins}W / {self.losses}L / {self.draws}D)\n"
+            f"**Win streak:** {self.streak} (best {self.best_streak})"
+        )
+        return embed
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+import discord
+
+__all__ = (
+    'EditStats',
+    'EditScheduler',
+)
+
+_logger = logging.getLogger(__name__)
+
+EditTarget = Union[discord.Message, discord.PartialMessage]
+
+# Interaction tokens last 15 minutes, edits for older interactions go through the channel instead.
+INTERACTION_LIFETIME = datetime.timedelta(minutes=14)
+
+
+@dataclass(slots=True)
+class EditStats:
+    """Counters describing the edits sent by an :class:`EditScheduler`."""
+
+    requested: int = 0
+    sent: int = 0
+    through_interaction: int = 0
+    coalesced: int = 0
+    failed: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"requested={self.requested} sent={self.sent} through_interaction={self.through_interaction} "
+            f"saved={self.coalesced} failed={self.failed}"
+        )
+
+
+@dataclass(slots=True)
+class _PendingEdit:
+    message: EditTarget
+    interaction: Optional[discord.Interaction]
+    fields: dict[str, Any]
+
+
+class EditScheduler:
+    """Sends message edits for interactive views, merging edits that pile up.
+
+    Discord rate limits edits per channel, so clicking through a view quickly or running
+    several games in one channel makes every edit wait on the bucket. Pending edits are kept
+    per message instead, and an edit scheduled while an earlier one for the same message is
+    still waiting is merged into it, so only the latest state gets sent.
+
+    An edit caused by a component interaction is sent through the latest interaction's webhook,
+    which is rate limited on its own rather than with the channel. Other edits, such as timeouts,
+    and edits for interactions whose token is about to expire use the channel's bucket.
+
+    Each channel's edits are sent one at a time, taking turns between the channel's messages.
+    After an edit through the channel the next one waits ``interval`` seconds.
+
+    Parameters
+    ----------
+    interval : float
+        The seconds to wait between two edits in the same channel, defaults to 1.
+    """
+
+    def __init__(self, *, interval: float = 1.0) -> None:
+        self.interval = interval
+        self.stats = EditStats()
+        # channel id -> message id -> pending edit
+        self._pending: dict[int, dict[int, _PendingEdit]] = {}
+        self._workers: dict[int, asyncio.Task[None]] = {}
+
+    @property
+    def depth(self) -> int:
+        """The number of messages waiting for an edit."""
+        return sum(len(pending) for pending in self._pending.values())
+
+    def __str__(self) -> str:
+        return f"depth={self.depth} channels={len(self._workers)} {self.stats}"
+
+    def schedule(
+        self, message: EditTarget, *, interaction: Optional[discord.Interaction] = None, **fields: Any
+    ) -> None:
+        """Schedules an edit, merging it into the message's pending edit if there is one.
+
+        Parameters
+        ----------
+        message : Union[discord.Message, discord.PartialMessage]
+            The message to edit.
+        interaction : Optional[discord.Interaction]
+            A deferred component interaction on the message, the edit is sent through its webhook.
+        **fields : Any
+            The keyword arguments for :meth:`discord.Message.edit` that
+            :meth:`discord.Interaction.edit_original_response` takes too, later edits win.
+        """
+        self.stats.requested += 1
+        channel_id = message.channel.id
+        pending = self._pending.setdefault(channel_id, {})
+
+        entry = pending.get(message.id)
+        if entry is not None:
+            entry.fields.update(fields)
+            if interaction is not None:
+                # The newest interaction's token lasts the longest.
+                entry.interaction = interaction
+            self.stats.coalesced += 1
+        else:
+            pending[message.id] = _PendingEdit(message, interaction, fields)
+
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._run(channel_id))
+
+    async def respond(self, interaction: discord.Interaction, message: EditTarget, **fields: Any) -> None:
+        """Acknowledges a component interaction right away and schedules the edit it caused.
+
+        Parameters
+        ----------
+        interaction : discord.Interaction
+            The interaction to acknowledge.
+        message : Union[discord.Message, discord.PartialMessage]
+            The message to edit.
+        **fields : Any
+            The keyword arguments for :meth:`discord.Message.edit`.
+        """
+        if not interaction.response.is_done():
+            await interaction.response.defer()
+        # The original response of a deferred component interaction is the message the component is on.
+        if interaction.message is not None and interaction.message.id == message.id:
+            self.schedule(message, interaction=interaction, **fields)
+        else:
+            self.schedule(message, **fields)
+
+    async def _run(self, channel_id: int) -> None:
+        pending = self._pending[channel_id]
+        try:
+            while pending:
+                message_id = next(iter(pending))
+                edit = pending.pop(message_id)
+                interaction = edit.interaction
+                if interaction is not None and discord.utils.utcnow() - interaction.created_at > INTERACTION_LIFETIME:
+                    interaction = None
+
+                try:
+                    if interaction is not None:
+                        await interaction.edit_original_response(**edit.fields)
+                    else:
+                        await edit.message.edit(**edit.fields)
+                except discord.HTTPException as err:
+                    self.stats.failed += 1
+                    _logger.warning(f"Could not edit message {message_id} in {channel_id=}: {err}")
+                else:
+                    self.stats.sent += 1
+                    self.stats.through_interaction += interaction is not None
+
+                # Edits scheduled while one is being sent are merged, and channel edits wait for the bucket.
+                if interaction is None:
+                    await asyncio.sleep(self.interval)
+        finally:
+            del self._workers[channel_id]
+            if not pending:
+                del self._pending[channel_id]
+
+    async def close(self) -> None:
+        """Waits for every pending edit to be sent."""
+        _logger.info(f"Flushing pending message edits ({self}).")
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
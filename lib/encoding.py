@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Literal, Optional, Sequence
+
+from PIL import Image
+
+__all__ = (
+    'EncoderConfig',
+    'EncodedImage',
+    'EncodeStats',
+    'encode_image',
+    'encode_animation',
+)
+
+_logger = logging.getLogger(__name__)
+
+ImageFormat = Literal["png", "png-palette", "webp"]
+AnimationFormat = Literal["gif", "webp"]
+
+DEFAULT_UPLOAD_BUDGET = 8 * 1024 * 1024  # 8 MiB, the upload limit for unboosted guilds
+
+
+@dataclass(frozen=True, slots=True)
+class EncoderConfig:
+    """How a template's renders are encoded.
+
+    Formats are tried in order and the first one that fits in ``max_bytes`` is used.
+    If none fit, the smallest output is used. Animations have their own formats and budget.
+    """
+
+    formats: tuple[ImageFormat, ...] = ("png",)
+    compress_level: int = 3
+    webp_quality: int = 80
+    max_bytes: int = DEFAULT_UPLOAD_BUDGET
+    animated_formats: tuple[AnimationFormat, ...] = ("gif",)
+    animated_max_bytes: int = DEFAULT_UPLOAD_BUDGET
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> EncoderConfig:
+        for key in ("formats", "animated_formats"):
+            if key in data:
+                data = {**data, key: tuple(data[key])}
+        return cls(**data)
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedImage:
+    """An encoded render and what it cost to encode."""
+
+    data: bytes
+    extension: str
+    encode_time: float
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+@dataclass(slots=True)
+class EncodeStats:
+    """Running totals of the encodes for a single template."""
+
+    count: int = 0
+    total_time: float = 0.0
+    total_bytes: int = 0
+    formats: dict[str, int] = field(default_factory=dict)
+
+    def record(self, image: EncodedImage) -> None:
+        self.count += 1
+        self.total_time += image.encode_time
+        self.total_bytes += len(image.data)
+        self.formats[image.extension] = self.formats.get(image.extension, 0) + 1
+
+    def __str__(self) -> str:
+        if not self.count:
+            return "no encodes"
+        formats = ", ".join(f"{ext}: {count}" for ext, count in self.formats.items())
+        return (
+            f"{self.count} encodes, avg {self.total_time / self.count * 1000:.1f}ms, "
+            f"avg {self.total_bytes / self.count / 1024:.1f}KiB ({formats})"
+        )
+
+
+def _encode_as(image: Image.Image, fmt: ImageFormat, config: EncoderConfig) -> tuple[bytes, str]:
+    buffered_image = io.BytesIO()
+    if fmt == "png":
+        image.save(buffered_image, "PNG", compress_level=config.compress_level)
+        return buffered_image.getvalue(), "png"
+    elif fmt == "png-palette":
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # Fast octree is the only quantizer that handles transparency.
+        image.quantize(256, method=Image.Quantize.FASTOCTREE).save(buffered_image, "PNG", optimize=True)
+        return buffered_image.getvalue(), "png"
+    elif fmt == "webp":
+        image.save(buffered_image, "WEBP", quality=config.webp_quality, method=4)
+        return buffered_image.getvalue(), "webp"
+
+    raise ValueError(f"Unknown image format {fmt!r}")
+
+
+def encode_image(image: Image.Image, config: Optional[EncoderConfig] = None) -> EncodedImage:
+    """Encodes an image using the first format in the config that fits the upload budget.
+
+    Parameters
+    ----------
+    image : Image.Image
+        The image to encode.
+    config : Optional[EncoderConfig]
+        How to encode the image, defaults to a PNG.
+
+    Returns
+    -------
+    EncodedImage
+        The encoded image.
+    """
+    config = config or EncoderConfig()
+    start = time.perf_counter()
+
+    smallest: Optional[tuple[bytes, str]] = None
+    for fmt in config.formats:
+        data, extension = _encode_as(image, fmt, config)
+        if len(data) <= config.max_bytes:
+            return EncodedImage(data, extension, time.perf_counter() - start)
+
+        _logger.debug(f"{fmt} encode was {len(data)} bytes, over the {config.max_bytes} byte budget.")
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = (data, extension)
+
+    assert smallest is not None, "EncoderConfig.formats must not be empty"
+    return EncodedImage(smallest[0], smallest[1], time.perf_counter() - start)
+
+
+def _encode_animation_as(
+    frames: Sequence[Image.Image], durations: Sequence[int], fmt: AnimationFormat, config: EncoderConfig
+) -> bytes:
+    buffered_image = io.BytesIO()
+    options: dict[str, Any] = {"save_all": True, "append_images": frames[1:], "duration": list(durations), "loop": 0}
+    if fmt == "gif":
+        frames[0].save(buffered_image, "GIF", **options)
+    elif fmt == "webp":
+        frames[0].save(buffered_image, "WEBP", quality=config.webp_quality, method=4, **options)
+    else:
+        raise ValueError(f"Unknown animation format {fmt!r}")
+    return buffered_image.getvalue()
+
+
+def encode_animation(
+    frames: Sequence[Image.Image], durations: Sequence[int], config: Optional[EncoderConfig] = None
+) -> EncodedImage:
+    """Encodes an animation using the first animated format in the config that fits its budget.
+
+    Parameters
+    ----------
+    frames : Sequence[Image.Image]
+        The frames, at least one.
+    durations : Sequence[int]
+        How long each frame is shown in milliseconds.
+    config : Optional[EncoderConfig]
+        How to encode the animation, defaults to a GIF.
+
+    Returns
+    -------
+    EncodedImage
+        The encoded animation, the smallest one if no format fit ``animated_max_bytes``.
+    """
+    config = config or EncoderConfig()
+    start = time.perf_counter()
+
+    smallest: Optional[tuple[bytes, str]] = None
+    for fmt in config.animated_formats:
+        data = _encode_animation_as(frames, durations, fmt, config)
+        if len(data) <= config.animated_max_bytes:
+            return EncodedImage(data, fmt, time.perf_counter() - start)
+
+        _logger.debug(f"Animated {fmt} encode was {len(data)} bytes, over the {config.animated_max_bytes} byte budget.")
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = (data, fmt)
+
+    assert smallest is not None, "EncoderConfig.animated_formats must not be empty"
+    return EncodedImage(smallest[0], smallest[1], time.perf_counter() - start)
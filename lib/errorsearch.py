@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from .dbmodels import ErrorLog
+
+__all__ = (
+    'SearchResult',
+    'is_supported',
+    'has_index',
+    'create_index',
+    'search_errors',
+)
+
+_logger = logging.getLogger(__name__)
+
+FTS_TABLE = "errorlog_fts"
+
+# The index reads its text from errorlog's own summary and item columns rather than keeping a copy,
+# so it only adds the index itself. Tracebacks are stored compressed and can't be read by SQLite, an
+# error's summary is the last line of its traceback, usually the exception and its message.
+# Triggers keep it in step with every insert, delete and update of errorlog, whatever made them.
+_SCHEMA = (
+    f'CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(summary, item, content=\'errorlog\', content_rowid=\'id\')',
+    f'CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "errorlog" BEGIN '
+    f'INSERT INTO "{FTS_TABLE}" (rowid, summary, item) VALUES (new."id", new."summary", new."item"); END',
+    f'CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "errorlog" BEGIN '
+    f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, summary, item) '
+    f'VALUES (\'delete\', old."id", old."summary", old."item"); END',
+    f'CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE OF "summary", "item" ON "errorlog" BEGIN '
+    f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, summary, item) '
+    f'VALUES (\'delete\', old."id", old."summary", old."item"); '
+    f'INSERT INTO "{FTS_TABLE}" (rowid, summary, item) VALUES (new."id", new."summary", new."item"); END',
+    f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'rebuild\')',
+)
+
+# How much each column counts towards a result's rank, in the order they were declared.
+_WEIGHTS = (2.0, 1.0)
+
+
+@dataclass(slots=True)
+class SearchResult:
+    """An error that matched a search."""
+
+    id: int
+    item: Optional[str]
+    snippet: str
+
+
+def is_supported(connection: BaseDBAsyncClient) -> bool:
+    """Whether the connection's database has full-text search, only SQLite's FTS5 is used."""
+    return connection.capabilities.dialect == "sqlite"
+
+
+async def _index_sql(connection: BaseDBAsyncClient) -> Optional[str]:
+    rows = await connection.execute_query_dict("SELECT sql FROM sqlite_master WHERE name = ?", [FTS_TABLE])
+    return rows[0]["sql"] if rows else None
+
+
+async def has_index(connection: BaseDBAsyncClient) -> bool:
+    """Whether the search index was created, always False for databases without full-text search."""
+    return is_supported(connection) and await _index_sql(connection) is not None
+
+
+async def create_index(connection: BaseDBAsyncClient) -> bool:
+    """Creates the search index and indexes every logged error, if it doesn't exist yet.
+
+    Everything is done in one transaction, so an interrupted run leaves no index behind and the
+    next run starts over.
+
+    Parameters
+    ----------
+    connection : BaseDBAsyncClient
+        The database connection, must support full-text search.
+
+    Returns
+    -------
+    bool
+        Whether the index was created, an existing index is left as it is.
+    """
+    if await _index_sql(connection) is not None:
+        return False
+
+    # Statements are run one at a time, executing a script would commit the transaction first.
+    async with in_transaction() as transaction:
+        for statement in _SCHEMA:
+            await transaction.execute_query(statement)
+    return True
+
+
+def _match_expression(query: str) -> str:
+    """Turns a query into an FTS5 expression matching every word, so punctuation is searched for as is."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+async def search_errors(query: str, *, limit: int = 20) -> list[SearchResult]:
+    """Searches the logged errors.
+
+    With SQLite errors are ranked by how well their summary and item match every word of the query.
+    Other databases fall back to the newest errors whose summary or item contain the query.
+
+    Parameters
+    ----------
+    query : str
+        What to search for.
+    limit : int
+        The most results to return, defaults to 20.
+
+    Returns
+    -------
+    list[SearchResult]
+        The matching errors, best first.
+    """
+    connection = Tortoise.get_connection("default")
+    if not await has_index(connection):
+        errorlogs = (
+            await ErrorLog.filter(Q(summary__icontains=query) | Q(item__icontains=query))
+            .order_by("-id")
+            .limit(limit)
+            .values("id", "item", "summary")
+        )
+        return [SearchResult(row["id"], row["item"], row["summary"] or "") for row in errorlogs]
+
+    expression = _match_expression(query)
+    if not expression:
+        return []
+
+    weights = ", ".join(map(str, _WEIGHTS))
+    rows = await connection.execute_query_dict(
+        f'SELECT rowid AS "id", "item", snippet("{FTS_TABLE}", -1, \'**\', \'**\', \'...\', 16) AS "snippet" '
+        f'FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH ? ORDER BY bm25("{FTS_TABLE}", {weights}) LIMIT ?',
+        [expression, limit],
+    )
+    return [SearchResult(row["id"], row["item"], row["snippet"]) for row in rows]
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from tortoise import timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from .dbmodels import ErrorGroup, ErrorLog
+
+__all__ = (
+    'fingerprint',
+    'summarize',
+    'group_errors',
+    'SinkStats',
+    'ErrorSink',
+)
+
+_logger = logging.getLogger(__name__)
+
+# Parts of a traceback that change between occurrences of the same bug.
+# Other numbers, such as status codes or missing keys, tell different failures apart so they're kept.
+_VOLATILE = (
+    (re.compile(r"\bline \d+"), "line N"),  # Line numbers, which move as the code is edited
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),  # Memory addresses
+    (re.compile(r"\b\d{15,20}\b"), "N"),  # Discord snowflakes
+)
+
+
+def fingerprint(traceback: str) -> str:
+    """Gets a fingerprint that's the same for every traceback of the same bug.
+
+    Parameters
+    ----------
+    traceback : str
+        The formatted traceback.
+
+    Returns
+    -------
+    str
+        The fingerprint, a hex digest.
+    """
+    for pattern, replacement in _VOLATILE:
+        traceback = pattern.sub(replacement, traceback)
+    return hashlib.sha1(traceback.encode("UTF-8")).hexdigest()
+
+
+def summarize(traceback: str) -> str:
+    """Gets the last line of a traceback, usually the exception and its message."""
+    lines = traceback.strip().splitlines()
+    return lines[-1][:200] if lines else ""
+
+
+async def group_errors(
+    errorlogs: list[ErrorLog], connection: BaseDBAsyncClient, *, sample_size: Optional[int] = None
+) -> None:
+    """Assigns errors to their groups, creating or updating the groups.
+
+    Parameters
+    ----------
+    errorlogs : list[ErrorLog]
+        The errors, oldest first.
+    connection : BaseDBAsyncClient
+        The database connection, usually a transaction.
+    sample_size : Optional[int]
+        How many occurrences of a group keep their own traceback, the traceback of later ones is
+        emptied. Every occurrence keeps its traceback if None.
+    """
+    groups: collections.defaultdict[str, list[ErrorLog]] = collections.defaultdict(list)
+    for errorlog in errorlogs:
+        groups[fingerprint(errorlog.traceback)].append(errorlog)
+
+    for key, grouped in groups.items():
+        first, last = grouped[0], grouped[-1]
+        group = await ErrorGroup.get_or_none(fingerprint=key, using_db=connection)
+        if group is None:
+            group = await ErrorGroup.create(
+                fingerprint=key,
+                traceback=first.traceback,
+                summary=summarize(first.traceback),
+                count=len(grouped),
+                first_seen=first.timestamp,
+                last_seen=last.timestamp,
+                last_error=last.id,
+                using_db=connection,
+            )
+            seen = 0
+        else:
+            seen = group.count
+            updates: dict[str, Any] = {"count": F("count") + len(grouped)}
+            # Older errors are grouped when upgrading, they mustn't move the group's latest error back.
+            if last.id > group.last_error:
+                updates.update(last_seen=last.timestamp, last_error=last.id)
+                group.last_seen, group.last_error = last.timestamp, last.id
+            if first.timestamp < group.first_seen:
+                updates["first_seen"] = group.first_seen = first.timestamp
+            await ErrorGroup.filter(id=group.id).using_db(connection).update(**updates)
+            group.count += len(grouped)
+
+        for index, errorlog in enumerate(grouped, start=seen):
+            errorlog.group = group
+            if sample_size is not None and index >= sample_size:
+                errorlog.traceback = ""
+
+
+@dataclass(slots=True)
+class SinkStats:
+    """Counters describing the error sink."""
+
+    logged: int = 0
+    written: int = 0
+    failed: int = 0
+    retries: int = 0
+    batches: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"logged={self.logged} written={self.written} failed={self.failed} "
+            f"retries={self.retries} batches={self.batches}"
+        )
+
+
+class ErrorSink:
+    """Writes error logs to the database in batches, in the background.
+
+    Ids are handed out from a counter seeded with the highest id in the table when the sink starts,
+    so an error has its id as soon as it's logged and users can be told about it before it's written.
+    Logged errors wait in a bounded queue and are written with a single ``bulk_create`` once
+    ``batch_size`` of them are waiting or ``flush_interval`` seconds after the first one was logged.
+    Logging waits for room in the queue when it's full.
+
+    A batch that can't be written, usually because the database is busy, is retried with a growing
+    delay and only dropped after ``MAX_ATTEMPTS`` tries.
+
+    Parameters
+    ----------
+    batch_size : int
+        The most errors written at once, defaults to 50.
+    flush_interval : float
+        The longest an error waits to be written in seconds, defaults to 2.
+    max_queue : int
+        How many errors may wait to be written, defaults to 1000.
+    on_written : Optional[Callable[[ErrorLog], None]]
+        Called with every error once it's written.
+    """
+
+    # How many occurrences of a group keep their own traceback.
+    SAMPLE_SIZE = 5
+    # How many times a batch is tried, and the seconds before the first retry, doubled after each one.
+    MAX_ATTEMPTS = 4
+    RETRY_DELAY = 0.5
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        max_queue: int = 1000,
+        on_written: Optional[Callable[[ErrorLog], None]] = None,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self.stats = SinkStats()
+        self._queue: asyncio.Queue[Optional[ErrorLog]] = asyncio.Queue(maxsize=max_queue)
+        self._pending: dict[int, ErrorLog] = {}
+        self._next_id = 1
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def __str__(self) -> str:
+        return f"pending={len(self._pending)} {self.stats}"
+
+    async def start(self) -> None:
+        """Reserves ids after the highest one in the table and starts writing errors."""
+        max_id = await ErrorLog.all().order_by("-id").first().values_list("id", flat=True)
+        self._next_id = (max_id or 0) + 1  # type: ignore
+        self._task = asyncio.create_task(self._run())
+
+    def pending(self, error_id: int) -> Optional[ErrorLog]:
+        """Gets an error that was logged but not written yet.
+
+        Parameters
+        ----------
+        error_id : int
+            The id of the error.
+
+        Returns
+        -------
+        Optional[ErrorLog]
+            The error, None if it isn't waiting to be written.
+        """
+        return self._pending.get(error_id)
+
+    async def log(self, traceback: str, item: Optional[str] = None) -> ErrorLog:
+        """Logs an error, it's written in the background.
+
+        Parameters
+        ----------
+        traceback : str
+            The formatted traceback.
+        item : Optional[str]
+            What raised the error, such as the command.
+
+        Returns
+        -------
+        ErrorLog
+            The error with its id, it may not be written yet.
+        """
+        errorlog = ErrorLog(
+            id=self._next_id, timestamp=timezone.now(), traceback=traceback, summary=summarize(traceback), item=item
+        )
+        self._next_id += 1
+        self._pending[errorlog.id] = errorlog
+        self.stats.logged += 1
+        await self._queue.put(errorlog)
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return errorlog
+
+    async def _next_batch(self) -> tuple[list[ErrorLog], bool]:
+        """Waits for a batch of errors, returning it and whether the sink was closed."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+
+        if self._queue.qsize() + 1 < self.batch_size:
+            # Waiting on an event rather than the queue means a timeout can't drop an error.
+            self._batch_ready.clear()
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            errorlog = self._queue.get_nowait()
+            if errorlog is None:
+                return batch, True
+            batch.append(errorlog)
+        return batch, False
+
+    async def _write(self, batch: list[ErrorLog]) -> None:
+        # Grouping empties the tracebacks past the sample, a retry has to group the errors from scratch.
+        tracebacks = [errorlog.traceback for errorlog in batch]
+        try:
+            for attempt in range(1, self.MAX_ATTEMPTS + 1):
+                try:
+                    async with in_transaction() as connection:
+                        await group_errors(batch, connection, sample_size=self.SAMPLE_SIZE)
+                        await ErrorLog.bulk_create(batch, using_db=connection)
+                except Exception as err:
+                    if attempt == self.MAX_ATTEMPTS:
+                        self.stats.failed += len(batch)
+                        _logger.exception(f"Could not write errors {batch[0].id} to {batch[-1].id}, dropping them.")
+                        return
+
+                    self.stats.retries += 1
+                    _logger.warning(f"Could not write errors {batch[0].id} to {batch[-1].id}, retrying: {err!r}")
+                    for errorlog, traceback in zip(batch, tracebacks):
+                        errorlog.traceback = traceback
+                        errorlog.group = None  # type: ignore
+                    await asyncio.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+                else:
+                    break
+
+            self.stats.written += len(batch)
+            self.stats.batches += 1
+            if self.on_written is not None:
+                for errorlog in batch:
+                    self.on_written(errorlog)
+        finally:
+            # Errors stay pending while they're retried, so they can still be looked up.
+            for errorlog in batch:
+                self._pending.pop(errorlog.id, None)
+
+    async def _run(self) -> None:
+        closed = False
+        while not closed:
+            batch, closed = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    async def close(self) -> None:
+        """Writes every error still waiting and stops the sink."""
+        _logger.info(f"Flushing the error sink ({self}).")
+        if self._task is None:
+            return
+
+        await self._queue.put(None)
+        self._batch_ready.set()
+        await self._task
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import zlib
+from dataclasses import dataclass
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from . import errorsearch
+from .dbmodels import ErrorLog
+from .errorsink import group_errors, summarize
+
+__all__ = (
+    'migrate',
+    'group_old_errors',
+    'CompressionReport',
+    'compress_tracebacks',
+)
+
+_logger = logging.getLogger(__name__)
+
+# Columns added to existing tables after they were first created, as (table, column, definition).
+# Tortoise's schema generation only creates missing tables, so these are added by hand.
+ADDED_COLUMNS: tuple[tuple[str, str, str], ...] = (
+    ("errorlog", "group_id", 'BIGINT REFERENCES "errorgroup" ("id") ON DELETE SET NULL'),
+    ("errorlog", "summary", "VARCHAR(200)"),
+)
+
+# Models whose ``Meta.indexes`` were added after their tables were first created.
+INDEXED_MODELS: tuple[type[Model], ...] = (ErrorLog,)
+
+# Text columns that now hold compressed bytes, as (table, column).
+# SQLite stores bytes in a text column as they are, only Postgres needs the type changed.
+COMPRESSED_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("errorlog", "traceback"),
+    ("errorgroup", "traceback"),
+)
+
+
+def _is_sqlite(connection: BaseDBAsyncClient) -> bool:
+    return connection.capabilities.dialect == "sqlite"
+
+
+def _param(connection: BaseDBAsyncClient, index: int) -> str:
+    """Gets the query parameter placeholder for the connection's driver, ``index`` starts at 1."""
+    return "?" if _is_sqlite(connection) else f"${index}"
+
+
+async def get_columns(connection: BaseDBAsyncClient, table: str) -> dict[str, str]:
+    """Gets a table's columns and their types.
+
+    Parameters
+    ----------
+    connection : BaseDBAsyncClient
+        The database connection.
+    table : str
+        The name of the table.
+
+    Returns
+    -------
+    dict[str, str]
+        The column names to their lowercase types, empty if the table doesn't exist.
+    """
+    if _is_sqlite(connection):
+        rows = await connection.execute_query_dict(f'PRAGMA table_info("{table}")')
+        return {row["name"]: row["type"].lower() for row in rows}
+
+    rows = await connection.execute_query_dict(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = $1", [table]
+    )
+    return {row["column_name"]: row["data_type"].lower() for row in rows}
+
+
+async def migrate() -> None:
+    """Brings tables created by older versions up to date, run after the schemas are generated.
+
+    Tables that don't exist are skipped, so this is safe to run on every start even when the
+    schemas are managed by hand.
+    """
+    connection = Tortoise.get_connection("default")
+    for table, column, definition in ADDED_COLUMNS:
+        columns = await get_columns(connection, table)
+        if not columns or column in columns:
+            continue
+
+        _logger.info(f"Adding column {column} to {table}.")
+        await connection.execute_script(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+
+    # The indexes get the names schema generation would give them, so existing ones are skipped.
+    generator = connection.schema_generator(connection)
+    for model in INDEXED_MODELS:
+        if not await get_columns(connection, model._meta.db_table):
+            continue
+        for field_names in model._meta.indexes:
+            await connection.execute_script(generator._get_index_sql(model, list(field_names), safe=True))
+
+    if not _is_sqlite(connection):
+        for table, column in COMPRESSED_COLUMNS:
+            if (await get_columns(connection, table)).get(column) != "text":
+                continue
+
+            _logger.info(f"Changing {table}.{column} to bytea.")
+            await connection.execute_script(
+                f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE BYTEA USING convert_to("{column}", \'UTF8\')'
+            )
+
+    if "group_id" in await get_columns(connection, "errorlog") and await get_columns(connection, "errorgroup"):
+        await group_old_errors()
+
+    # After grouping, which fills in the summaries the search index reads.
+    if errorsearch.is_supported(connection) and await get_columns(connection, "errorlog"):
+        if await errorsearch.create_index(connection):
+            _logger.info("Indexed the logged errors for search.")
+
+
+async def group_old_errors(*, chunk_size: int = 500) -> int:
+    """Groups errors logged before errors were grouped, and fills in their summaries.
+
+    Rows are handled ``chunk_size`` at a time in their own transaction, so an interrupted run
+    picks up where it stopped. Their tracebacks are kept, unlike those of new repeats.
+
+    Parameters
+    ----------
+    chunk_size : int
+        How many rows to group per transaction, defaults to 500.
+
+    Returns
+    -------
+    int
+        How many errors were grouped.
+    """
+    grouped = 0
+    last_id = 0
+    while True:
+        errorlogs = await ErrorLog.filter(group_id__isnull=True, id__gt=last_id).order_by("id").limit(chunk_size)
+        if not errorlogs:
+            break
+        last_id = errorlogs[-1].id
+
+        async with in_transaction() as transaction:
+            for errorlog in errorlogs:
+                errorlog.summary = summarize(errorlog.traceback)
+            await group_errors(errorlogs, transaction)
+            await ErrorLog.bulk_update(errorlogs, fields=["group_id", "summary"], using_db=transaction)
+
+        grouped += len(errorlogs)
+        await asyncio.sleep(0)
+
+    if grouped:
+        _logger.info(f"Grouped {grouped} errors logged before grouping was added.")
+    return grouped
+
+
+@dataclass(slots=True)
+class CompressionReport:
+    """What compressing the stored tracebacks did."""
+
+    rows: int = 0
+    skipped: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self) -> str:
+        return (
+            f"Compressed {self.rows} tracebacks from {self.bytes_before / 1024:.1f}KiB "
+            f"to {self.bytes_after / 1024:.1f}KiB, saving {self.bytes_saved / 1024:.1f}KiB. "
+            f"Left {self.skipped} that compression wouldn't shrink as they are."
+        )
+
+
+def _is_compressed(value: bytes) -> bool:
+    try:
+        zlib.decompress(value)
+    except zlib.error:
+        return False
+    return True
+
+
+async def compress_tracebacks(*, chunk_size: int = 500) -> CompressionReport:
+    """Compresses tracebacks stored before compression was added.
+
+    Rows are handled ``chunk_size`` at a time in their own short transaction, yielding to the
+    event loop in between, so the database is never locked for long and the bot keeps running.
+
+    Parameters
+    ----------
+    chunk_size : int
+        How many rows to read per transaction, defaults to 500.
+
+    Returns
+    -------
+    CompressionReport
+        How many rows were compressed and how many bytes that saved, rows that compression
+        wouldn't shrink are left as they are.
+    """
+    connection = Tortoise.get_connection("default")
+    report = CompressionReport()
+
+    for table, column in COMPRESSED_COLUMNS:
+        last_id = 0
+        while True:
+            rows = await connection.execute_query_dict(
+                f'SELECT "id", "{column}" AS "value" FROM "{table}" '
+                f'WHERE "id" > {_param(connection, 1)} ORDER BY "id" LIMIT {_param(connection, 2)}',
+                [last_id, chunk_size],
+            )
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            updates = []
+            for row in rows:
+                value = row["value"]
+                raw = value.encode("UTF-8") if isinstance(value, str) else bytes(value)
+                if not raw or _is_compressed(raw):
+                    continue
+                compressed = zlib.compress(raw)
+                if len(compressed) >= len(raw):
+                    report.skipped += 1
+                    continue
+                updates.append([compressed, row["id"]])
+                report.rows += 1
+                report.bytes_before += len(raw)
+                report.bytes_after += len(compressed)
+
+            if updates:
+                async with in_transaction() as transaction:
+                    await transaction.execute_many(
+                        f'UPDATE "{table}" SET "{column}" = {_param(connection, 1)} WHERE "id" = {_param(connection, 2)}',
+                        updates,
+                    )
+            await asyncio.sleep(0)
+
+    _logger.info(str(report))
+    return report
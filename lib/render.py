@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import io
+import logging
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Iterator, Optional, Union
+
+from PIL import Image
+
+from .encoding import EncodedImage, EncodeStats, encode_animation, encode_image
+from .templates import RenderPlan, TemplateDef, compile_template, load_template_defs
+
+__all__ = (
+    'TEMPLATES',
+    'get_plan',
+    'render_template',
+    'render_animated_template',
+    'RenderEngine',
+)
+
+_logger = logging.getLogger(__name__)
+
+TEMPLATES: dict[str, TemplateDef] = load_template_defs()
+
+SHARED_MEMORY_THRESHOLD = 256 * 1024  # 256 KiB
+
+MAX_ANIMATION_FRAMES = 60
+# Every frame is kept as RGBA, four bytes per pixel, until the animation is encoded,
+# so large templates get fewer frames.
+MAX_ANIMATION_PIXELS = 8_000_000
+MAX_ANIMATION_DURATION = 10_000  # milliseconds
+MIN_FRAME_DURATION = 20  # milliseconds, anything shorter is slowed down to 100ms by most viewers
+
+# Compiled templates for the current process, filled by _prepare_plans.
+_plans: dict[str, RenderPlan] = {}
+
+
+def _prepare_plans() -> None:
+    for name, template in TEMPLATES.items():
+        _plans[name] = compile_template(template)
+
+
+def get_plan(name: str) -> RenderPlan:
+    """Gets a template's render plan, compiling every template the first time it's called in a process.
+
+    Parameters
+    ----------
+    name : str
+        The name of the template.
+
+    Returns
+    -------
+    RenderPlan
+        The compiled template.
+    """
+    if not _plans:
+        _prepare_plans()
+    return _plans[name]
+
+
+def _init_worker() -> None:
+    _prepare_plans()
+
+
+def _open_avatar(data: bytes, size: tuple[int, int]) -> Image.Image:
+    avatar = Image.open(io.BytesIO(data))
+    if avatar.mode != "RGBA":
+        avatar = avatar.convert("RGBA")
+
+    avatar.thumbnail(size)
+    return avatar
+
+
+class _FrameSource:
+    """Decodes an avatar one frame at a time, looping animated avatars."""
+
+    def __init__(self, data: bytes, size: tuple[int, int]) -> None:
+        self._image = Image.open(io.BytesIO(data))
+        self._size = size
+        self._index = 0
+        self.animated: bool = getattr(self._image, "is_animated", False)
+        self.looped = not self.animated
+        self._load(0)
+
+    def _load(self, start: float) -> None:
+        self._image.seek(self._index)
+        frame = self._image.convert("RGBA")
+        frame.thumbnail(self._size)
+        self.frame = frame
+
+        if self.animated:
+            self.ends_at = start + max(self._image.info.get("duration") or 100, MIN_FRAME_DURATION)
+        else:
+            self.ends_at = math.inf
+
+    def advance(self) -> None:
+        start = self.ends_at
+        self._index += 1
+        if self._index >= self._image.n_frames:
+            self._index = 0
+            self.looped = True
+        self._load(start)
+
+
+def _frame_limit(plan: RenderPlan) -> int:
+    width, height = plan.base.size
+    return max(1, min(MAX_ANIMATION_FRAMES, MAX_ANIMATION_PIXELS // (width * height)))
+
+
+def _composite_frames(plan: RenderPlan, avatars: tuple[bytes, ...], durations: list[int]) -> Iterator[Image.Image]:
+    # Yields each distinct frame once its duration is known, appending that duration to durations first.
+    sources = [_FrameSource(avatar, slot.size) for slot, avatar in zip(plan.template.slots, avatars, strict=True)]
+    max_frames = _frame_limit(plan)
+
+    pending: Optional[Image.Image] = None
+    pending_duration = 0.0
+    yielded = 0
+    now = 0.0
+
+    while True:
+        frame = plan.base.copy()
+        for slot, mask, source in zip(plan.template.slots, plan.masks, sources):
+            if mask is not None and mask.size != source.frame.size:
+                mask = mask.resize(source.frame.size)
+            frame.paste(source.frame, slot.position, mask)
+
+        until = min(min(source.ends_at for source in sources), MAX_ANIMATION_DURATION)
+        # getbbox only looks at the alpha band of RGBA images, so the pixels are compared directly.
+        if pending is not None and pending.tobytes() == frame.tobytes():
+            pending_duration += until - now
+        else:
+            if pending is not None:
+                durations.append(round(pending_duration))
+                yield pending
+                yielded += 1
+            pending, pending_duration = frame, until - now
+
+        now = until
+        if now >= MAX_ANIMATION_DURATION or yielded + 1 >= max_frames:
+            break
+
+        for source in sources:
+            if source.ends_at == now:
+                source.advance()
+        if all(source.looped for source in sources):
+            break
+
+    assert pending is not None
+    durations.append(round(pending_duration))
+    yield pending
+
+
+def render_animated_template(name: str, *avatars: bytes) -> EncodedImage:
+    """Renders a template as an animation, animating any animated avatars.
+
+    Identical frames are merged and the animation is cut off after ``MAX_ANIMATION_DURATION``
+    milliseconds or ``MAX_ANIMATION_FRAMES`` frames, fewer for templates so large that the frames
+    would hold more than ``MAX_ANIMATION_PIXELS`` pixels. The frames are encoded as the template's
+    ``animated_formats`` say, and an animation bigger than ``animated_max_bytes`` in every format
+    is replaced by a still render.
+
+    Parameters
+    ----------
+    name : str
+        The name of the template.
+    *avatars : bytes
+        The avatars to paste in, in slot order.
+
+    Returns
+    -------
+    EncodedImage
+        The animation, or the still image if the animation was too big.
+    """
+    plan = get_plan(name)
+    durations: list[int] = []
+    frames = list(_composite_frames(plan, avatars, durations))
+
+    image = encode_animation(frames, durations, plan.template.encoder)
+    if len(image) > plan.template.encoder.animated_max_bytes:
+        _logger.debug(f"Animated {name} render is {len(image)} bytes, falling back to a still render.")
+        return render_template(name, *avatars)
+    return image
+
+
+def render_template(name: str, *avatars: bytes, animated: bool = False) -> EncodedImage:
+    """Renders a template with the given avatars.
+
+    Parameters
+    ----------
+    name : str
+        The name of the template.
+    *avatars : bytes
+        The avatars to paste in, in slot order.
+    animated : bool
+        Whether to animate animated avatars, see :func:`render_animated_template`.
+
+    Returns
+    -------
+    EncodedImage
+        The image with the avatars overlayed, encoded as the template's encoder config says.
+    """
+    if animated:
+        return render_animated_template(name, *avatars)
+
+    plan = get_plan(name)
+    template_image = plan.base.copy()
+
+    for slot, mask, avatar in zip(plan.template.slots, plan.masks, avatars, strict=True):
+        avatar_image = _open_avatar(avatar, slot.size)
+        if mask is not None and mask.size != avatar_image.size:
+            mask = mask.resize(avatar_image.size)
+        template_image.paste(avatar_image, slot.position, mask)
+
+    return encode_image(template_image, plan.template.encoder)
+
+
+# Either the encoded bytes, or the name and size of the shared memory block holding them.
+_Payload = Union[bytes, tuple[str, int]]
+
+
+def _render(template: str, avatars: tuple[bytes, ...], params: dict[str, Any]) -> tuple[_Payload, str, float]:
+    image = render_template(template, *avatars, **params)
+    size = len(image.data)
+    if size < SHARED_MEMORY_THRESHOLD:
+        return image.data, image.extension, image.encode_time
+
+    # Large outputs skip pickling, the main process reads them straight out of shared memory.
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    shm.buf[:size] = image.data
+    shm.close()
+    return (shm.name, size), image.extension, image.encode_time
+
+
+def _collect(payload: _Payload) -> bytes:
+    if isinstance(payload, bytes):
+        return payload
+
+    name, size = payload
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _discard(future: concurrent.futures.Future[tuple[_Payload, str, float]]) -> None:
+    # Frees the shared memory of a render nobody is waiting for anymore.
+    if not future.cancelled() and future.exception() is None:
+        _collect(future.result()[0])
+
+
+class RenderEngine:
+    """Runs image renders in a pool of worker processes.
+
+    Pillow holds the GIL for most of a render, so running them in threads stalls the event loop.
+    Workers compile every template once when they start, and only bytes are sent to and from them.
+    Outputs of at least ``SHARED_MEMORY_THRESHOLD`` bytes come back through shared memory
+    instead of being pickled.
+
+    Parameters
+    ----------
+    max_workers : Optional[int]
+        The number of worker processes, defaults to the number of CPUs.
+    """
+
+    def __init__(self, *, max_workers: Optional[int] = None) -> None:
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self.encode_stats: collections.defaultdict[str, EncodeStats] = collections.defaultdict(EncodeStats)
+
+    async def render(self, template: str, *avatars: bytes, **params: Any) -> EncodedImage:
+        """Renders a template in a worker process.
+
+        Parameters
+        ----------
+        template : str
+            The name of the template to render.
+        *avatars : bytes
+            The avatars to paste into the template, in slot order.
+        **params : Any
+            Extra keyword arguments for the template's renderer.
+
+        Returns
+        -------
+        EncodedImage
+            The encoded image.
+        """
+        future = self._pool.submit(_render, template, avatars, params)
+        try:
+            payload, extension, encode_time = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_discard)
+            raise
+
+        image = EncodedImage(_collect(payload), extension, encode_time)
+        self.encode_stats[template].record(image)
+        return image
+
+    async def close(self) -> None:
+        """Stops the worker processes, dropping any renders that haven't started."""
+        _logger.info("Shutting down the render engine.")
+        await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
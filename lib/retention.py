@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from tortoise import Tortoise, timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from .dbmodels import ErrorGroup, ErrorLog
+
+__all__ = (
+    'PruneReport',
+    'prune_errors',
+)
+
+_logger = logging.getLogger(__name__)
+
+# Tables whose statistics are refreshed after pruning.
+PRUNED_TABLES = ("errorlog", "errorgroup")
+
+
+@dataclass(slots=True)
+class PruneReport:
+    """What pruning the error log did."""
+
+    errors: int = 0
+    groups: int = 0
+    batches: int = 0
+
+    def __str__(self) -> str:
+        return f"Deleted {self.errors} logged errors and {self.groups} error groups in {self.batches} batches."
+
+
+async def _delete_batches(report: PruneReport, filters: dict[str, Any], batch_size: int, pause: float) -> int:
+    """Deletes the errors matching ``filters`` oldest first, returning the highest id deleted."""
+    last_id = 0
+    while True:
+        ids = await ErrorLog.filter(**filters).order_by("id").limit(batch_size).values_list("id", flat=True)
+        if not ids:
+            return last_id
+
+        # Each batch is its own statement, so the write lock is only held briefly.
+        # The affected row count includes the search index's rows on SQLite, so the ids are counted instead.
+        await ErrorLog.filter(id__in=ids).delete()
+        report.errors += len(ids)
+        report.batches += 1
+        last_id = max(last_id, ids[-1])  # type: ignore
+        await asyncio.sleep(pause)
+
+
+async def _maintain(connection: BaseDBAsyncClient) -> None:
+    """Refreshes the query planner's statistics and gives freed pages back where the database allows it."""
+    if connection.capabilities.dialect == "sqlite":
+        # Only frees pages when the database uses incremental auto vacuum, a full VACUUM locks everything.
+        await connection.execute_script("PRAGMA incremental_vacuum")
+        for table in PRUNED_TABLES:
+            await connection.execute_script(f'ANALYZE "{table}"')
+    else:
+        for table in PRUNED_TABLES:
+            await connection.execute_script(f'VACUUM ANALYZE "{table}"')
+
+
+async def prune_errors(
+    *,
+    max_age: Optional[datetime.timedelta] = None,
+    max_rows: Optional[int] = None,
+    batch_size: int = 500,
+    pause: float = 0.1,
+) -> PruneReport:
+    """Deletes logged errors that are too old or too many, along with groups that have no errors left.
+
+    Errors are deleted ``batch_size`` at a time with a ``pause`` between batches, so other writes,
+    such as the error sink's, aren't held up for long. The search index follows through its trigger.
+
+    Parameters
+    ----------
+    max_age : Optional[datetime.timedelta]
+        How long errors are kept, they're kept forever if None.
+    max_rows : Optional[int]
+        How many of the newest errors are kept, at least one, they're all kept if None.
+    batch_size : int
+        How many errors to delete at once, defaults to 500.
+    pause : float
+        The seconds to wait between batches, defaults to 0.1.
+
+    Returns
+    -------
+    PruneReport
+        How many errors and groups were deleted.
+    """
+    report = PruneReport()
+    last_id = 0
+
+    if max_age is not None:
+        cutoff = timezone.now() - max_age
+        last_id = await _delete_batches(report, {"timestamp__lt": cutoff}, batch_size, pause)
+
+    if max_rows is not None:
+        # The pk index makes skipping to the oldest error that's kept cheap.
+        oldest_kept = await ErrorLog.all().order_by("-id").offset(max(max_rows, 1) - 1).first().values_list("id", flat=True)
+        if oldest_kept is not None:
+            last_id = max(last_id, await _delete_batches(report, {"id__lt": oldest_kept}, batch_size, pause))
+
+    if not report.errors:
+        return report
+
+    # A group's occurrences all have ids up to its latest, so it's empty once that's older than every error left.
+    # Groups still being written to only get newer latest errors, so they're never caught by this.
+    oldest_left = await ErrorLog.all().order_by("id").first().values_list("id", flat=True)
+    report.groups = await ErrorGroup.filter(last_error__lt=oldest_left or last_id + 1).delete()
+
+    await _maintain(Tortoise.get_connection("default"))
+    _logger.info(str(report))
+    return report
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+__all__ = (
+    'RenderQueueFull',
+    'SchedulerStats',
+    'RenderScheduler',
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """Raised when a render is refused because too many are already waiting."""
+
+
+@dataclass(slots=True)
+class SchedulerStats:
+    """Counters describing the render queue."""
+
+    admitted: int = 0
+    rejected: int = 0
+    peak_depth: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"admitted={self.admitted} rejected={self.rejected} peak_depth={self.peak_depth} "
+            f"avg_wait={self.avg_wait * 1000:.1f}ms max_wait={self.max_wait * 1000:.1f}ms"
+        )
+
+
+class RenderScheduler:
+    """Limits how many renders run at once, queueing the rest fairly between guilds.
+
+    Waiting renders are kept in one queue per guild and the guilds are served round robin,
+    so a single busy guild can't starve the others. Once ``max_queue`` renders are waiting
+    new ones are refused with :exc:`RenderQueueFull`.
+
+    Parameters
+    ----------
+    concurrency : int
+        How many renders may run at once, usually the number of render workers.
+    max_queue : int
+        How many renders may wait for a slot.
+    """
+
+    # Weight given to the newest sample in the render time average.
+    SMOOTHING = 0.2
+
+    def __init__(self, *, concurrency: int, max_queue: int) -> None:
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.stats = SchedulerStats()
+        self._queues: collections.OrderedDict[Optional[int], collections.deque[asyncio.Future[None]]] = (
+            collections.OrderedDict()
+        )
+        self._queued = 0
+        self._running = 0
+        self._avg_render_time = 0.0
+
+    @property
+    def depth(self) -> int:
+        """The number of renders waiting for a slot."""
+        return self._queued
+
+    @property
+    def full(self) -> bool:
+        return self._queued >= self.max_queue
+
+    def expected_wait(self) -> float:
+        """Estimates how long a new render would wait before it starts.
+
+        Returns
+        -------
+        float
+            The estimated wait in seconds.
+        """
+        if self._running < self.concurrency and not self._queued:
+            return 0.0
+        return (self._queued + 1) / self.concurrency * self._avg_render_time
+
+    def __str__(self) -> str:
+        return (
+            f"depth={self.depth}/{self.max_queue} running={self._running}/{self.concurrency} "
+            f"avg_render={self._avg_render_time * 1000:.1f}ms expected_wait={self.expected_wait() * 1000:.1f}ms "
+            f"{self.stats}"
+        )
+
+    def _dispatch(self) -> None:
+        while self._running < self.concurrency and self._queues:
+            guild_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+
+            if queue:
+                self._queues.move_to_end(guild_id)  # Let the next guild go first
+            else:
+                del self._queues[guild_id]
+
+            waiter.set_result(None)
+            self._running += 1
+
+    def _remove_waiter(self, guild_id: Optional[int], waiter: asyncio.Future[None]) -> None:
+        queue = self._queues.get(guild_id)
+        if queue is None or waiter not in queue:
+            return
+
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._queues[guild_id]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id: Optional[int]) -> AsyncIterator[None]:
+        """Waits for a free render slot, holding it until the block exits.
+
+        Parameters
+        ----------
+        guild_id : Optional[int]
+            The guild the render is for, None for direct messages.
+
+        Raises
+        ------
+        RenderQueueFull
+            Too many renders are already waiting.
+        """
+        if self.full:
+            self.stats.rejected += 1
+            raise RenderQueueFull()
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(guild_id, collections.deque()).append(waiter)
+        self._queued += 1
+        self.stats.peak_depth = max(self.stats.peak_depth, self._queued)
+        enqueued_at = time.perf_counter()
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on.
+                self._running -= 1
+                self._dispatch()
+            else:
+                self._remove_waiter(guild_id, waiter)
+            raise
+
+        started_at = time.perf_counter()
+        wait = started_at - enqueued_at
+        self.stats.admitted += 1
+        self.stats.total_wait += wait
+        self.stats.max_wait = max(self.stats.max_wait, wait)
+
+        try:
+            yield
+        finally:
+            render_time = time.perf_counter() - started_at
+            if self._avg_render_time:
+                self._avg_render_time += self.SMOOTHING * (render_time - self._avg_render_time)
+            else:
+                self._avg_render_time = render_time
+
+            self._running -= 1
+            self._dispatch()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import pathlib
+from dataclasses import dataclass
+from typing import Any, Literal, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .encoding import EncoderConfig
+
+__all__ = (
+    'AvatarSlot',
+    'TextLayer',
+    'TemplateDef',
+    'RenderPlan',
+    'get_font',
+    'load_template',
+    'load_template_defs',
+    'compile_template',
+)
+
+_logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = pathlib.Path("./cogs/base_images")
+FONT_DIR = pathlib.Path("./cogs/fonts")
+
+
+@dataclass(frozen=True, slots=True)
+class AvatarSlot:
+    """Where an avatar goes in a template.
+
+    ``source`` is either ``"author"`` for the user running the command or ``"target"`` for the user they chose.
+    ``mask`` is either ``"circle"`` or the file name of a greyscale mask next to the template image.
+    """
+
+    source: Literal["author", "target"]
+    size: tuple[int, int]
+    position: tuple[int, int]
+    mask: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class TextLayer:
+    """Static text drawn onto a template."""
+
+    text: str
+    position: tuple[int, int]
+    font: str
+    size: int
+    fill: str = "black"
+    align: str = "left"
+    stroke_width: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateDef:
+    """A template as described by its JSON file.
+
+    This is cheap to load and holds no image data, see :class:`RenderPlan` for the compiled form.
+    """
+
+    name: str
+    description: str
+    target_description: str
+    image: str
+    slots: tuple[AvatarSlot, ...]
+    text: tuple[TextLayer, ...] = ()
+    encoder: EncoderConfig = EncoderConfig()
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> TemplateDef:
+        slots = tuple(
+            AvatarSlot(
+                source=slot["source"],
+                size=tuple(slot["size"]),  # type: ignore
+                position=tuple(slot["position"]),  # type: ignore
+                mask=slot.get("mask"),
+            )
+            for slot in data["slots"]
+        )
+        text = tuple(TextLayer(**{**layer, "position": tuple(layer["position"])}) for layer in data.get("text", ()))
+        return cls(
+            name=data["name"],
+            description=data["description"],
+            target_description=data["target_description"],
+            image=data["image"],
+            slots=slots,
+            text=text,
+            encoder=EncoderConfig.from_dict(data.get("encoder", {})),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class RenderPlan:
+    """A compiled template, ready to be rendered without touching the disk.
+
+    ``base`` already has the text layers drawn on and ``masks`` are already at their slot's size,
+    both should be treated as read only.
+    """
+
+    template: TemplateDef
+    base: Image.Image
+    masks: tuple[Optional[Image.Image], ...]
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Loads a font, reusing it if it was already loaded.
+
+    Parameters
+    ----------
+    path : str
+        The path to the font file.
+    size : int
+        The font size.
+
+    Returns
+    -------
+    ImageFont.FreeTypeFont
+        The loaded font.
+    """
+    return ImageFont.truetype(path, size)
+
+
+def load_template(path: pathlib.Path) -> Image.Image:
+    """Fully decodes a template image so it can be copied for each render.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path to the template image.
+
+    Returns
+    -------
+    Image.Image
+        The decoded image. This should be treated as read only.
+    """
+    with Image.open(path) as image:
+        image.load()
+        return image.copy()
+
+
+def load_template_defs(directory: pathlib.Path = TEMPLATE_DIR) -> dict[str, TemplateDef]:
+    """Loads every template definition in a directory.
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+        The directory holding the ``.json`` definitions, defaults to ``cogs/base_images``.
+
+    Returns
+    -------
+    dict[str, TemplateDef]
+        The templates by name.
+    """
+    templates: dict[str, TemplateDef] = {}
+    for path in sorted(directory.glob("*.json")):
+        with open(path) as fp:
+            template = TemplateDef.from_dict(json.load(fp))
+        templates[template.name] = template
+    return templates
+
+
+def _compile_mask(mask: str, size: tuple[int, int], directory: pathlib.Path) -> Image.Image:
+    if mask == "circle":
+        image = Image.new("L", size, 0)
+        ImageDraw.Draw(image).ellipse((0, 0, size[0] - 1, size[1] - 1), fill=255)
+        return image
+
+    return load_template(directory / mask).convert("L").resize(size)
+
+
+def compile_template(template: TemplateDef, directory: pathlib.Path = TEMPLATE_DIR) -> RenderPlan:
+    """Compiles a template into a render plan.
+
+    Parameters
+    ----------
+    template : TemplateDef
+        The template to compile.
+    directory : pathlib.Path
+        The directory holding the template's images, defaults to ``cogs/base_images``.
+
+    Returns
+    -------
+    RenderPlan
+        The compiled template.
+    """
+    base = load_template(directory / template.image)
+
+    if template.text:
+        draw = ImageDraw.Draw(base)
+        for layer in template.text:
+            font = get_font(str(FONT_DIR / layer.font), layer.size)
+            draw.text(
+                layer.position,
+                layer.text,
+                layer.fill,
+                font=font,
+                align=layer.align,
+                stroke_width=layer.stroke_width,
+            )
+
+    masks = tuple(_compile_mask(slot.mask, slot.size, directory) if slot.mask else None for slot in template.slots)
+    _logger.debug(f"Compiled template {template.name!r}")
+    return RenderPlan(template=template, base=base, masks=masks)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import random
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import pytest
+
+from lib.connectfour import BitBoard, ConnectFourSolver, Difficulty, _winning_cells, solve
+
+# (columns, rows, connect), including odd connect lengths and boards wider than they are tall.
+SHAPES = [
+    (7, 6, 4),
+    (4, 4, 3),
+    (5, 4, 3),
+    (8, 7, 5),
+    (9, 6, 5),
+    (10, 8, 6),
+    (15, 10, 6),
+    (6, 9, 4),
+]
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def grid(board: BitBoard) -> list[list[Optional[int]]]:
+    return [[board.cell(column, row) for row in range(board.rows)] for column in range(board.columns)]
+
+
+def has_line(cells: list[list[Optional[int]]], player: int, connect: int) -> bool:
+    columns, rows = len(cells), len(cells[0])
+    for column in range(columns):
+        for row in range(rows):
+            for dc, dr in DIRECTIONS:
+                end_column, end_row = column + dc * (connect - 1), row + dr * (connect - 1)
+                if not (0 <= end_column < columns and 0 <= end_row < rows):
+                    continue
+                if all(cells[column + dc * i][row + dr * i] == player for i in range(connect)):
+                    return True
+    return False
+
+
+def completes_line(cells: list[list[Optional[int]]], column: int, row: int, player: int, connect: int) -> bool:
+    """Whether a piece in an empty cell would be part of a line, counting outwards from it in every direction."""
+    columns, rows = len(cells), len(cells[0])
+    for dc, dr in DIRECTIONS:
+        length = 1
+        for sign in (1, -1):
+            c, r = column + sign * dc, row + sign * dr
+            while 0 <= c < columns and 0 <= r < rows and cells[c][r] == player:
+                length += 1
+                c, r = c + sign * dc, r + sign * dr
+        if length >= connect:
+            return True
+    return False
+
+
+def random_positions(columns: int, rows: int, connect: int, *, games: int, seed: int):
+    """Yields every position of random games, up to and including the first win."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        board = BitBoard(columns, rows, connect)
+        player = 0
+        while not board.is_full():
+            board.play(rng.choice([c for c in range(columns) if board.can_play(c)]), player)
+            yield board, player
+            if board.is_win(player):
+                break
+            player ^= 1
+
+
+@pytest.mark.parametrize("columns, rows, connect", SHAPES)
+def test_is_win_matches_brute_force(columns: int, rows: int, connect: int) -> None:
+    wins = 0
+    for board, _ in random_positions(columns, rows, connect, games=40, seed=columns * 100 + rows * 10 + connect):
+        cells = grid(board)
+        for player in (0, 1):
+            expected = has_line(cells, player, connect)
+            assert board.is_win(player) == expected
+            wins += expected
+    assert wins, "no game was won, the test isn't checking anything"
+
+
+@pytest.mark.parametrize("columns, rows, connect", SHAPES)
+def test_winning_cells_matches_brute_force(columns: int, rows: int, connect: int) -> None:
+    for board, _ in random_positions(columns, rows, connect, games=20, seed=columns + rows + connect):
+        cells = grid(board)
+        mask = board._masks[0] | board._masks[1]
+        for player in (0, 1):
+            if has_line(cells, player, connect):
+                continue  # Every empty cell "completes" a line once there is one
+            expected = 0
+            for column in range(columns):
+                for row in range(rows):
+                    if cells[column][row] is None and completes_line(cells, column, row, player, connect):
+                        expected |= 1 << (column * (rows + 1) + row)
+
+            assert _winning_cells(board._geometry, board._masks[player], mask) == expected
+
+
+def play(board: BitBoard, moves: list[int]) -> int:
+    """Plays alternating moves starting with player 0, returning the player to move."""
+    for ply, column in enumerate(moves):
+        board.play(column, ply % 2)
+    return len(moves) % 2
+
+
+@pytest.mark.parametrize(
+    "shape, moves, winning_columns",
+    [
+        ((7, 6, 4), [0, 6, 1, 6, 2, 5], {3}),  # Horizontal
+        ((8, 7, 5), [0, 7, 0, 7, 0, 7, 0, 6], {0}),  # Vertical, connect five
+        ((5, 4, 3), [1, 4, 2, 4], {0, 3}),  # Either end of the line wins
+    ],
+)
+def test_solve_takes_an_immediate_win(
+    shape: tuple[int, int, int], moves: list[int], winning_columns: set[int]
+) -> None:
+    board = BitBoard(*shape)
+    player = play(board, moves)
+    column, _ = solve(board, player, max_depth=6, time_limit=5.0)
+    assert column in winning_columns
+
+    board.play(column, player)
+    assert board.is_win(player)
+
+
+@pytest.mark.parametrize(
+    "shape, moves, blocking_column",
+    [
+        ((7, 6, 4), [6, 0, 6, 1, 5, 2], 3),  # Horizontal
+        ((7, 6, 4), [0, 3, 6, 3, 6, 3], 3),  # Vertical
+        ((9, 6, 5), [8, 0, 8, 0, 7, 0, 7, 0], 0),  # Vertical, connect five
+    ],
+)
+def test_solve_blocks_an_immediate_loss(shape: tuple[int, int, int], moves: list[int], blocking_column: int) -> None:
+    board = BitBoard(*shape)
+    player = play(board, moves)
+    column, _ = solve(board, player, max_depth=6, time_limit=5.0)
+    assert column == blocking_column
+
+
+class FailingPool:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+    def submit(self, *args, **kwargs) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        future.set_exception(self.error)
+        return future
+
+    def shutdown(self, *args, **kwargs) -> None:
+        pass
+
+
+@pytest.mark.parametrize("error", [RuntimeError("search failed"), BrokenProcessPool("worker died")])
+def test_solver_plays_the_centre_when_a_search_fails(error: Exception) -> None:
+    solver = ConnectFourSolver()
+    solver._pool.shutdown()
+    solver._pool = FailingPool(error)  # type: ignore
+
+    board = BitBoard()
+    assert asyncio.run(solver.best_move(board, 0, Difficulty.easy)) == 3
+    if isinstance(error, BrokenProcessPool):
+        assert isinstance(solver._pool, concurrent.futures.ProcessPoolExecutor)
+    solver._pool.shutdown()